@@ -0,0 +1,593 @@
+"""Load and latency benchmarks for the agents API against the fake LLM provider."""
+
+import argparse
+import asyncio
+import gc
+import importlib.util
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+SCENARIOS = ("chat", "chat_stream", "generate_prd", "validate")
+DEFAULT_CONCURRENCY = "1,4,16,64"
+
+BRIEF = (
+    "Build a fitness tracking mobile app called FitTracker #{n}. "
+    "Target users: fitness enthusiasts and beginners who want to track workouts. "
+    "Main features: workout logging, progress tracking, goal setting. "
+    "Problem: people lose motivation because they cannot see their progress. "
+    "Success metric: 10,000 active users in 6 months."
+)
+
+# (method, path, streams tokens) per scenario
+ENDPOINTS = {
+    "chat": ("POST", "/agents/chat", False),
+    "chat_stream": ("POST", "/agents/chat/stream", True),
+    "generate_prd": ("POST", "/agents/generate-prd", False),
+    "validate": ("POST", "/agents/validate", False),
+}
+
+# A sample is (status, latency seconds, time to first token seconds)
+Sample = Tuple[int, float, float]
+Sender = Callable[[str, str, Dict[str, Any], bool], Awaitable[Sample]]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of unsorted values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds."""
+    return {
+        "p50": round(percentile(values, 50) * 1000, 3),
+        "p95": round(percentile(values, 95) * 1000, 3),
+        "p99": round(percentile(values, 99) * 1000, 3),
+        "mean": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "max": round(max(values) * 1000, 3) if values else 0.0,
+    }
+
+
+def rss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    """Resident set size of a process, or None where /proc is unavailable."""
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def payload_for(scenario: str, n: int, run_id: str) -> Dict[str, Any]:
+    """Build a unique request body so caches and memoization never answer for the model."""
+    message = BRIEF.format(n=f"{run_id}-{scenario}-{n}")
+    if scenario == "validate":
+        return {"input": message}
+    return {"message": message, "template_type": "lean", "session_id": f"bench:{run_id}:{scenario}:{n}"}
+
+
+def first_token(chunk: bytes, streaming: bool) -> bool:
+    """Whether a response chunk carries the first token (any byte for non-streaming responses)."""
+    return not streaming or b"event: token" in chunk
+
+
+async def asgi_send(app, method: str, path: str, body: Dict[str, Any], streaming: bool) -> Sample:
+    """Call an ASGI app directly, timing the first token as it is sent rather than after buffering."""
+    data = json.dumps(body).encode()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": b"", "root_path": "", "server": ("bench", 80), "client": ("bench", 0),
+        "headers": [(b"host", b"bench"), (b"content-type", b"application/json"),
+                    (b"content-length", str(len(data)).encode())],
+    }
+    received = False
+    status = 0
+    ttft: Optional[float] = None
+    started = time.perf_counter()
+
+    async def receive():
+        nonlocal received
+        if received:
+            await asyncio.Event().wait()
+        received = True
+        return {"type": "http.request", "body": data, "more_body": False}
+
+    async def send(message):
+        nonlocal status, ttft
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and ttft is None:
+            chunk = message.get("body", b"")
+            if chunk and first_token(chunk, streaming):
+                ttft = time.perf_counter() - started
+
+    await app(scope, receive, send)
+    latency = time.perf_counter() - started
+    return status, latency, latency if ttft is None else ttft
+
+
+def http_sender(client: httpx.AsyncClient) -> Sender:
+    """Send requests over HTTP, reading the body as it streams."""
+    async def send(method: str, path: str, body: Dict[str, Any], streaming: bool) -> Sample:
+        started = time.perf_counter()
+        ttft: Optional[float] = None
+        async with client.stream(method, path, json=body) as response:
+            async for chunk in response.aiter_bytes():
+                if ttft is None and chunk and first_token(chunk, streaming):
+                    ttft = time.perf_counter() - started
+        latency = time.perf_counter() - started
+        return response.status_code, latency, latency if ttft is None else ttft
+    return send
+
+
+async def run_level(send: Sender, scenario: str, concurrency: int, requests: int, run_id: str,
+                    memory: Callable[[], Optional[int]]) -> Dict[str, Any]:
+    """Run ``requests`` calls of a scenario through ``concurrency`` closed-loop workers."""
+    method, path, streaming = ENDPOINTS[scenario]
+    samples: List[Sample] = []
+    failures = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, failures
+        while next_index < requests:
+            n = next_index
+            next_index += 1
+            try:
+                samples.append(await send(method, path, payload_for(scenario, n, f"{run_id}-{concurrency}"), streaming))
+            except Exception:
+                failures += 1
+
+    gc.collect()
+    rss_before = memory()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    rss_after = memory()
+
+    ok = [sample for sample in samples if 200 <= sample[0] < 300]
+    statuses: Dict[str, int] = {}
+    for status, _, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    if failures:
+        statuses["transport_error"] = failures
+
+    sessions = requests if scenario != "validate" else 0
+    memory_per_session = None
+    if sessions and rss_before is not None and rss_after is not None:
+        memory_per_session = round(max(0, rss_after - rss_before) / sessions / 1024, 2)
+
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": requests,
+        "ok": len(ok),
+        "errors": requests - len(ok),
+        "status_counts": statuses,
+        "duration_s": round(elapsed, 4),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": summarize([sample[1] for sample in ok]),
+        "ttft_ms": summarize([sample[2] for sample in ok]),
+        "memory_per_session_kb": memory_per_session,
+    }
+
+
+async def run_suite(send: Sender, scenarios: List[str], levels: List[int], requests: int,
+                    memory: Callable[[], Optional[int]], quiet: bool = False) -> List[Dict[str, Any]]:
+    """Run every scenario at every concurrency level, warming each scenario up first."""
+    run_id = f"{int(time.time())}-{os.getpid()}"
+    results = []
+    for scenario in scenarios:
+        method, path, streaming = ENDPOINTS[scenario]
+        await send(method, path, payload_for(scenario, -1, f"{run_id}-warmup"), streaming)
+        for concurrency in levels:
+            result = await run_level(send, scenario, concurrency, max(requests, concurrency), run_id, memory)
+            results.append(result)
+            if not quiet:
+                latency, ttft = result["latency_ms"], result["ttft_ms"]
+                print(f"{scenario:<13} c={concurrency:<4} {result['throughput_rps']:>9.1f} req/s  "
+                      f"p50 {latency['p50']:>8.1f}  p95 {latency['p95']:>8.1f}  p99 {latency['p99']:>8.1f} ms  "
+                      f"ttft p50 {ttft['p50']:>8.1f} ms  errors {result['errors']}")
+    return results
+
+
+def benchmark_env(latency_ms: float, tokens_per_second: float, data_dir: str) -> Dict[str, str]:
+    """Environment that points the app at the fake provider and scratch databases."""
+    return {
+        "LLM_PROVIDER": "fake",
+        "FAKE_LATENCY_MS": str(latency_ms),
+        "FAKE_TOKENS_PER_SECOND": str(tokens_per_second),
+        "SESSION_DB_PATH": os.path.join(data_dir, "sessions.db"),
+        "JOB_DB_PATH": os.path.join(data_dir, "jobs.db"),
+        "CACHE_DB_PATH": "",
+        "TEMPLATE_POLL_INTERVAL": "0",
+    }
+
+
+def import_server(args, data_dir: str):
+    """Import the app module with the benchmark environment, leaving ``os.environ`` as it was."""
+    # Only matters if this import is the first: configuration is read when the module loads
+    env = benchmark_env(args.latency_ms, args.tokens_per_second, data_dir)
+    added = {key: value for key, value in env.items() if key not in os.environ}
+    os.environ.update(added)
+    try:
+        import main as server
+    finally:
+        for key in added:
+            os.environ.pop(key, None)
+    return server
+
+
+async def run_in_process(args, scenarios: List[str], levels: List[int]) -> List[Dict[str, Any]]:
+    """Drive the FastAPI app in this process with a fake-provider agent swapped in."""
+    with tempfile.TemporaryDirectory() as data_dir:
+        server = import_server(args, data_dir)
+        from config import AgentConfig
+        from pmagents import PRDAgent
+        from providers import FakeProvider
+
+        session_db_path = AgentConfig.SESSION_DB_PATH
+        AgentConfig.SESSION_DB_PATH = os.path.join(data_dir, "sessions.db")
+        original = server.prd_agent
+        agent = PRDAgent(provider=FakeProvider(latency_ms=args.latency_ms, tokens_per_second=args.tokens_per_second))
+        server.prd_agent = agent
+        try:
+            async def send(method, path, body, streaming):
+                return await asgi_send(server.app, method, path, body, streaming)
+            return await run_suite(send, scenarios, levels, args.requests, rss_bytes, args.quiet)
+        finally:
+            server.prd_agent = original
+            AgentConfig.SESSION_DB_PATH = session_db_path
+            await agent.aclose()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 60.0):
+    """Wait until the server has warmed up, so the warm-up is not measured as request latency."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            # A 404 is a server from before /ready existed, which is ready once it answers
+            if (await client.get("/ready")).status_code in (200, 404):
+                return
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError("server did not become ready")
+        await asyncio.sleep(0.2)
+
+
+async def run_over_http(args, scenarios: List[str], levels: List[int]) -> List[Dict[str, Any]]:
+    """Benchmark a server over HTTP, starting one on the fake provider unless ``--url`` is given."""
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    timeout = httpx.Timeout(args.timeout)
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=timeout) as client:
+            await wait_ready(client)
+            return await run_suite(http_sender(client), scenarios, levels, args.requests, lambda: None, args.quiet)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        port = free_port()
+        # WORKERS also switches the app to shared sessions when there is more than one
+        env = {**os.environ, **benchmark_env(args.latency_ms, args.tokens_per_second, data_dir),
+               "WORKERS": str(args.workers)}
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=env
+        )
+        # With several workers the server pid is the supervisor, whose memory says nothing about sessions
+        rss = (lambda: rss_bytes(server.pid)) if args.workers == 1 else (lambda: None)
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=timeout) as client:
+                await wait_ready(client)
+                return await run_suite(http_sender(client), scenarios, levels, args.requests, rss, args.quiet)
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+
+PRD_VOCABULARY = (
+    "rollout integration identity billing analytics security legal procurement availability owner quarter "
+    "criterion workflow dashboard onboarding retention latency throughput compliance audit region tenant "
+    "migration adoption pilot feedback escalation support training budget vendor contract dependency "
+    "milestone capacity forecast revenue churn conversion engagement reliability incident review policy"
+).split()
+
+
+def enterprise_prd(sections: Dict[str, Any], seed: int = 0) -> str:
+    """A full-length Enterprise PRD: two paragraphs and a list under every template section.
+
+    The words are drawn at random from a PRD vocabulary so the text
+    compresses about as well as real prose, not as well as repeated lines.
+    """
+    rng = random.Random(seed)
+
+    def sentence(words: int) -> str:
+        return " ".join(rng.choice(PRD_VOCABULARY) for _ in range(words)).capitalize() + "."
+
+    parts = []
+    for key, section in sections.items():
+        parts.append(f"## {section.get('title', key)}")
+        parts.append(" ".join(sentence(rng.randint(12, 24)) for _ in range(5)))
+        parts.append(" ".join(sentence(rng.randint(12, 24)) for _ in range(4)))
+        parts.extend(f"- {sentence(rng.randint(10, 18))}" for _ in range(8))
+        parts.append("")
+    return "\n".join(parts)
+
+
+def time_per_call(fn: Callable[[], Any], iterations: int) -> float:
+    """Mean seconds per call."""
+    fn()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations
+
+
+async def run_serialization(args) -> List[Dict[str, Any]]:
+    """Compare the old and new response paths for a full Enterprise PRD and a long conversation.
+
+    ``before`` is what an endpoint returning a Pydantic model cost: building
+    the model, FastAPI validating it again against ``response_model``,
+    ``jsonable_encoder`` and the standard library encoder. ``after`` is the
+    agent's dict serialized directly, with orjson when it is installed.
+    """
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        server = import_server(args, data_dir)
+        from pmagents import PRDAgent
+        from providers import FakeProvider
+        from serving import CompressionMiddleware, dumps
+
+        turns = itertools.count()
+        agent = PRDAgent(provider=FakeProvider(
+            responder=lambda system_prompt, user_input: enterprise_prd(
+                agent.template_loader.get_template_sections("enterprise"), next(turns)
+            )
+        ))
+        agent.preflight.enabled = False
+        agent.response_cache = None
+        try:
+            # The first turn's response carries the whole document twice, as content and as its patch
+            response = await agent.chat(
+                BRIEF.format(n=0), template_type="enterprise", session_id="serialize", generation_mode="single"
+            )
+            for n in range(1, 10):
+                await agent.chat(
+                    BRIEF.format(n=n), template_type="enterprise", session_id="serialize", generation_mode="single"
+                )
+            history = await agent.get_conversation_history("serialize")
+        finally:
+            await agent.aclose()
+
+    fields = {
+        "content": response["content"], "type": response.get("type", "response"),
+        "requires_input": response.get("requires_input", False), "missing_info": response.get("missing_info"),
+        "metadata": response.get("metadata"), "version": response.get("version"), "patch": response.get("patch"),
+    }
+
+    def before_chat() -> bytes:
+        model = server.ChatResponse(**fields)
+        validated = server.ChatResponse.model_validate(model.model_dump())
+        return JSONResponse(jsonable_encoder(validated)).body
+
+    def before_history() -> bytes:
+        model = server.ConversationHistory(messages=history)
+        validated = server.ConversationHistory.model_validate(model.model_dump())
+        return JSONResponse(jsonable_encoder(validated)).body
+
+    config = server.AgentConfig
+    compressor = CompressionMiddleware(
+        None, gzip_level=config.COMPRESSION_GZIP_LEVEL, brotli_quality=config.COMPRESSION_BROTLI_QUALITY
+    )
+    encodings = ["gzip"] + (["br"] if importlib.util.find_spec("brotli") else [])
+    results = []
+    for name, before, content in (
+        ("enterprise_prd", before_chat, fields),
+        ("conversation_history", before_history, {"messages": history}),
+    ):
+        body = dumps(content)
+        result = {
+            "payload": name,
+            "before_us": round(time_per_call(before, args.iterations) * 1e6, 1),
+            "after_us": round(time_per_call(lambda: dumps(content), args.iterations) * 1e6, 1),
+            "bytes": {"identity": len(body)},
+            "compress_us": {},
+        }
+        for encoding in encodings:
+            result["bytes"][encoding] = len(compressor.compress(body, encoding))
+            result["compress_us"][encoding] = round(
+                time_per_call(lambda: compressor.compress(body, encoding), args.iterations) * 1e6, 1
+            )
+        results.append(result)
+        if not args.quiet:
+            sizes = ", ".join(f"{encoding} {size:,}" for encoding, size in result["bytes"].items())
+            print(f"{name:<21} serialize {result['before_us']:>9.1f} -> {result['after_us']:>8.1f} us  "
+                  f"bytes {sizes}  compress {result['compress_us']} us")
+    return results
+
+
+def run_keywords(args) -> List[Dict[str, Any]]:
+    """Compare the validator's keyword detection with the per-keyword ``any()`` checks it replaced.
+
+    Inputs are a short chat message, a vague opening message and a long
+    brief, matching none and many of the keywords.
+    """
+    from tools import PRDValidator
+    from tools.keyword_matcher import KeywordMatcher
+
+    classes = PRDValidator.REQUIREMENT_KEYWORDS
+    matcher = KeywordMatcher(classes)
+
+    def before(text: str) -> frozenset:
+        return frozenset(name for name, keywords in classes.items() if any(keyword in text for keyword in keywords))
+
+    inputs = {
+        "vague_message": "build an app",
+        "chat_message": BRIEF.format(n=0).lower()[:150],
+        "long_brief_no_keywords": ("lorem ipsum dolor sit amet " * 650)[:16800],
+        "long_brief": (BRIEF.format(n=0).lower() + " ") * 55,
+    }
+    results = []
+    for name, text in inputs.items():
+        if matcher.scan(text) != before(text):
+            raise SystemExit(f"Keyword detection differs from the previous checks on {name}")
+        result = {
+            "payload": name,
+            "chars": len(text),
+            "before_us": round(min(time_per_call(lambda: before(text), args.iterations) for _ in range(5)) * 1e6, 3),
+            "after_us": round(min(time_per_call(lambda: matcher.scan(text), args.iterations) for _ in range(5)) * 1e6, 3),
+        }
+        results.append(result)
+        if not args.quiet:
+            print(f"{name:<23} {result['chars']:>6} chars  keywords {result['before_us']:>9.3f} -> {result['after_us']:>9.3f} us")
+    return results
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """List the scenario/concurrency pairs whose p95 latency or throughput regressed past the limit."""
+    previous = {(item["scenario"], item["concurrency"]): item for item in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        before = previous.get((result["scenario"], result["concurrency"]))
+        if before is None:
+            continue
+        name = f"{result['scenario']} c={result['concurrency']}"
+        old_p95, new_p95 = before["latency_ms"]["p95"], result["latency_ms"]["p95"]
+        if old_p95 and new_p95 > old_p95 * (1 + max_regression):
+            regressions.append(f"{name}: p95 {old_p95:.1f} -> {new_p95:.1f} ms")
+        old_rps, new_rps = before["throughput_rps"], result["throughput_rps"]
+        if old_rps and new_rps < old_rps * (1 - max_regression):
+            regressions.append(f"{name}: throughput {old_rps:.1f} -> {new_rps:.1f} req/s")
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mode", choices=("inprocess", "http"), default="inprocess")
+    parser.add_argument("--url", help="benchmark a running server instead of starting one (http mode)")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes for the server it starts (http mode)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma-separated, from {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default=DEFAULT_CONCURRENCY, help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and level")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="fake model latency before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="fake model token rate, 0 for instant")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="fail if p95 latency or throughput is this fraction worse than the baseline")
+    parser.add_argument("--serialization", action="store_true",
+                        help="measure response serialization and compression instead of load")
+    parser.add_argument("--keywords", action="store_true",
+                        help="measure validator keyword detection instead of load")
+    parser.add_argument("--iterations", type=int, default=200, help="serializations or scans per measurement")
+    parser.add_argument("--quiet", action="store_true")
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    levels = sorted({int(level) for level in args.concurrency.split(",") if level.strip()})
+
+    if args.serialization:
+        serialization = await run_serialization(args)
+        return {
+            "meta": {
+                "mode": "serialization",
+                "iterations": args.iterations,
+                "python": platform.python_version(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            },
+            "results": [],
+            "serialization": serialization,
+        }
+
+    if args.keywords:
+        return {
+            "meta": {
+                "mode": "keywords",
+                "iterations": args.iterations,
+                "python": platform.python_version(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            },
+            "results": [],
+            "keywords": run_keywords(args),
+        }
+
+    runner = run_in_process if args.mode == "inprocess" else run_over_http
+    results = await runner(args, scenarios, levels)
+    return {
+        "meta": {
+            "mode": args.mode,
+            "url": args.url,
+            "workers": args.workers if args.mode == "http" and not args.url else None,
+            "latency_ms": args.latency_ms,
+            "tokens_per_second": args.tokens_per_second,
+            "requests": args.requests,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Results written to {args.output}")
+    elif args.quiet:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("mode") != args.mode:
+            print(f"⚠️  Baseline was recorded in {baseline.get('meta', {}).get('mode')} mode, not {args.mode}")
+        regressions = compare(report["results"], baseline, args.max_regression)
+        for regression in regressions:
+            print(f"❌ Regression: {regression}")
+        if regressions:
+            return 1
+        print("✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,6 +13,13 @@ class AgentConfig:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
     OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
     
+    # LLM Provider ("openai", "ollama" or "fake")
+    LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai").lower()
+    OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "mistral:7b-instruct")
+    FAKE_LATENCY_MS = float(os.getenv("FAKE_LATENCY_MS", "0"))
+    FAKE_TOKENS_PER_SECOND = float(os.getenv("FAKE_TOKENS_PER_SECOND", "0"))
+    
     # Agent Configuration
     AGENT_NAME = os.getenv("AGENT_NAME", "PRD_Assistant")
     AGENT_DESCRIPTION = os.getenv("AGENT_DESCRIPTION", "AI Product Manager Assistant for PRD Creation")
@@ -21,14 +28,112 @@ class AgentConfig:
     BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:3001")
     FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
     
+    # Server (WORKERS=0 starts one worker process per CPU; reload only applies to a single worker)
+    HOST = os.getenv("HOST", "0.0.0.0")
+    PORT = int(os.getenv("PORT", "8000"))
+    WORKERS = int(os.getenv("WORKERS", "1")) or os.cpu_count() or 1
+    RELOAD = os.getenv("RELOAD", "true").lower() == "true" and WORKERS == 1
+    
     # Template Configuration
     TEMPLATES_PATH = "../backend/templates"
+    TEMPLATE_POLL_INTERVAL = float(os.getenv("TEMPLATE_POLL_INTERVAL", "2"))
     
     # Agent Behavior
     MAX_CLARIFICATION_ROUNDS = 3
     TEMPERATURE = 0.7
     MAX_TOKENS = 2000
     
+    # Model Routing (empty model names use the provider's default model)
+    ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() == "true"
+    ROUTER_SMALL_MODEL = os.getenv("ROUTER_SMALL_MODEL", "")
+    ROUTER_LARGE_MODEL = os.getenv("ROUTER_LARGE_MODEL", "")
+    ROUTER_LARGE_TEMPLATES = [
+        name.strip() for name in os.getenv("ROUTER_LARGE_TEMPLATES", "enterprise,technical,amazon").split(",")
+        if name.strip()
+    ]
+    ROUTER_LARGE_PROMPT_TOKENS = int(os.getenv("ROUTER_LARGE_PROMPT_TOKENS", "6000"))
+    ROUTER_CLARIFICATION_MAX_COMPLETENESS = float(os.getenv("ROUTER_CLARIFICATION_MAX_COMPLETENESS", "0.4"))
+    
+    # Pre-flight (completeness score at or below which opening messages get local clarification questions)
+    PREFLIGHT_ENABLED = os.getenv("PREFLIGHT_ENABLED", "true").lower() == "true"
+    PREFLIGHT_MAX_COMPLETENESS = float(os.getenv("PREFLIGHT_MAX_COMPLETENESS", "0.2"))
+    PREFLIGHT_TEMPLATE_THRESHOLDS = {
+        name.strip(): float(value)
+        for name, _, value in (
+            item.partition("=")
+            for item in os.getenv("PREFLIGHT_TEMPLATE_THRESHOLDS", "enterprise=0.4,amazon=0.4").split(",")
+            if "=" in item
+        )
+    }
+    
+    # Context Window (counted with tiktoken; without it, ~4 chars per token is only an estimate)
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "16000"))
+    CONTEXT_RECENT_TURNS = int(os.getenv("CONTEXT_RECENT_TURNS", "6"))
+    
+    # Per-Section Generation
+    SECTION_CONCURRENCY = int(os.getenv("SECTION_CONCURRENCY", "4"))
+    SECTION_MAX_RETRIES = int(os.getenv("SECTION_MAX_RETRIES", "2"))
+    SECTION_RETRY_DELAY = 0.5
+    
+    # LLM HTTP Connection Pool
+    LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))
+    LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20"))
+    LLM_HTTP_TIMEOUT = float(os.getenv("LLM_HTTP_TIMEOUT", "120"))
+    LLM_HTTP_CONNECT_TIMEOUT = float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", "10"))
+    LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() == "true"
+    
+    # LLM Admission Control
+    LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "16"))
+    LLM_MAX_IN_FLIGHT_PER_PROJECT = int(os.getenv("LLM_MAX_IN_FLIGHT_PER_PROJECT", "4"))
+    LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+    LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+    
+    # Response Cache
+    CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "512"))
+    CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "86400"))
+    CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "data/cache.db" if WORKERS > 1 else "")
+    CACHE_DB_MAX_BYTES = int(os.getenv("CACHE_DB_MAX_BYTES", str(512 * 1024 * 1024)))
+    CACHE_DB_PRUNE_INTERVAL = int(os.getenv("CACHE_DB_PRUNE_INTERVAL", "32"))
+    
+    # Batch Generation
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+    BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "200"))
+    BATCH_ADMISSION_TIMEOUT = float(os.getenv("BATCH_ADMISSION_TIMEOUT", "300"))
+    
+    # Background Jobs
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+    JOB_DB_PATH = os.getenv("JOB_DB_PATH", "data/jobs.db")
+    JOB_ADMISSION_TIMEOUT = float(os.getenv("JOB_ADMISSION_TIMEOUT", "900"))
+    JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "604800"))
+    
+    # Session Management
+    SESSION_MAX_IN_MEMORY = int(os.getenv("SESSION_MAX_IN_MEMORY", "1000"))
+    SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "1800"))
+    SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "data/sessions.db")
+    SESSION_MAX_HISTORY = int(os.getenv("SESSION_MAX_HISTORY", "50"))
+    SESSION_SHARED = os.getenv("SESSION_SHARED", str(WORKERS > 1)).lower() == "true"
+    DOCUMENT_MAX_VERSIONS = int(os.getenv("DOCUMENT_MAX_VERSIONS", "20"))
+    
+    # Response Compression (brotli for clients that accept it, gzip otherwise)
+    COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+    COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+    
+    # Telemetry (Agents SDK traces are only exported for providers that send prompts to OpenAI anyway)
+    SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+    SDK_TRACING_ENABLED = os.getenv("SDK_TRACING_ENABLED", "true").lower() == "true"
+    
+    # Request Profiling (PROFILER_TOKEN is required when enabled)
+    PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+    PROFILER_SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", "0"))
+    PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+    PROFILER_DIR = os.getenv("PROFILER_DIR", "data/profiles")
+    PROFILER_MAX_FILES = int(os.getenv("PROFILER_MAX_FILES", "200"))
+    PROFILER_TOKEN = os.getenv("PROFILER_TOKEN", "")
+    
     # Required PRD Information
     REQUIRED_PRD_FIELDS = [
         "product_name",
@@ -44,15 +149,27 @@ class AgentConfig:
         return {
             "name": cls.AGENT_NAME,
             "description": cls.AGENT_DESCRIPTION,
-            "model": cls.OPENAI_MODEL,
+            "provider": cls.LLM_PROVIDER,
+            "model": cls.get_model_name(),
             "temperature": cls.TEMPERATURE,
             "max_tokens": cls.MAX_TOKENS,
             "required_fields": cls.REQUIRED_PRD_FIELDS
         }
     
+    @classmethod
+    def get_model_name(cls) -> str:
+        """Get the default model name for the configured provider."""
+        if cls.LLM_PROVIDER == "ollama":
+            return cls.OLLAMA_MODEL
+        if cls.LLM_PROVIDER == "fake":
+            return "fake"
+        return cls.OPENAI_MODEL
+    
     @classmethod
     def validate_config(cls) -> bool:
         """Validate that required configuration is present."""
-        if not cls.OPENAI_API_KEY:
+        if cls.LLM_PROVIDER not in ("openai", "ollama", "fake"):
+            raise ValueError(f"Unknown LLM_PROVIDER: {cls.LLM_PROVIDER}")
+        if cls.LLM_PROVIDER == "openai" and not cls.OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY is required")
         return True
@@ -1,21 +1,31 @@
 """FastAPI server for AI agents."""
 
 import os
+import hmac
+import time
+import uuid
 import asyncio
-from typing import Dict, Any, List, Optional
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, AsyncIterator
+from fastapi import FastAPI, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response, JSONResponse
 from pydantic import BaseModel
-import uvicorn
 
-from pmagents import PRDAgent
+from pmagents import AdmissionRejected, PRIORITY_BULK, JobManager, JobStore, TASK_FULL_GENERATION, retry_rejected
 from config import AgentConfig
+from tools import KIND_SPEC
+from telemetry import REGISTRY, ServerTimingMiddleware, SamplingProfiler, ProfilingMiddleware
+from serving import FastJSONResponse, CompressionMiddleware, dumps
+
+if TYPE_CHECKING:  # pragma: no cover - the agent module loads the Agents SDK, which is slow to import
+    from pmagents import PRDAgent
 
 # Initialize FastAPI app
 app = FastAPI(
     title="PM Helper AI Agents",
     description="AI agents for PRD creation and product management",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # Configure CORS
@@ -30,17 +40,70 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
-# Global agent instance
-prd_agent = PRDAgent()
+# Compress large JSON responses; runs inside the timing middleware so compression counts toward "total"
+if AgentConfig.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware, minimum_size=AgentConfig.COMPRESSION_MIN_BYTES,
+        gzip_level=AgentConfig.COMPRESSION_GZIP_LEVEL, brotli_quality=AgentConfig.COMPRESSION_BROTLI_QUALITY
+    )
+
+# Request duration histograms and Server-Timing headers
+app.add_middleware(ServerTimingMiddleware, server_timing=AgentConfig.SERVER_TIMING_ENABLED)
+
+# Opt-in request profiling; without PROFILER_ENABLED the middleware is not installed at all
+profiler: Optional[SamplingProfiler] = None
+if AgentConfig.PROFILER_ENABLED:
+    if not AgentConfig.PROFILER_TOKEN:
+        # Otherwise any client could start sampling and download profiles
+        raise ValueError("PROFILER_ENABLED requires PROFILER_TOKEN")
+    profiler = SamplingProfiler(
+        AgentConfig.PROFILER_DIR, AgentConfig.PROFILER_INTERVAL_MS / 1000, AgentConfig.PROFILER_MAX_FILES
+    )
+    app.add_middleware(
+        ProfilingMiddleware, profiler=profiler,
+        sample_rate=AgentConfig.PROFILER_SAMPLE_RATE, token=AgentConfig.PROFILER_TOKEN
+    )
+
+# Global agent instance, built by the warm-up task after startup rather than at import,
+# so the server answers /health while the Agents SDK loads
+prd_agent: Optional["PRDAgent"] = None
+_warm_up_task: Optional[asyncio.Task] = None
+
+# Background job workers
+job_manager = JobManager(JobStore(AgentConfig.JOB_DB_PATH), num_workers=AgentConfig.JOB_WORKERS,
+                         retention_seconds=AgentConfig.JOB_RETENTION_SECONDS)
 
 # Request/Response models
 class ChatRequest(BaseModel):
     message: str
     template_type: str = "lean"
     project_id: Optional[int] = None
+    session_id: Optional[str] = None
+    project_context: Optional[Dict[str, Any]] = None
+    generation_mode: str = "single"
+
+class SectionRegenerateRequest(BaseModel):
+    instructions: str = ""
+    template_type: Optional[str] = None
+    project_id: Optional[int] = None
+    session_id: Optional[str] = None
+    project_context: Optional[Dict[str, Any]] = None
+
+class BatchBrief(BaseModel):
+    message: str
+    template_type: str = "lean"
     project_context: Optional[Dict[str, Any]] = None
+    id: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    briefs: List[BatchBrief]
+    concurrency: Optional[int] = None
+
+class JobRequest(ChatRequest):
+    kind: str = "prd"
 
 class ChatResponse(BaseModel):
     content: str
@@ -48,6 +111,8 @@ class ChatResponse(BaseModel):
     requires_input: bool = False
     missing_info: Optional[List[str]] = None
     metadata: Optional[Dict[str, Any]] = None
+    version: Optional[int] = None
+    patch: Optional[Dict[str, Any]] = None
 
 class TemplateInfo(BaseModel):
     name: str
@@ -55,43 +120,284 @@ class TemplateInfo(BaseModel):
     template_type: str
     sections: List[str]
     required_sections: List[str]
+    kind: str = "prd"
 
 class ConversationHistory(BaseModel):
     messages: List[Dict[str, Any]]
 
+def _build_agent() -> "PRDAgent":
+    """Import the agent module and build the agent; slow, so run off the event loop."""
+    from pmagents import PRDAgent
+    return PRDAgent()
+
+async def _warm_up():
+    """Build the agent on a worker thread and start its template watcher."""
+    global prd_agent
+    started = time.perf_counter()
+    if prd_agent is None:
+        try:
+            agent = await asyncio.to_thread(_build_agent)
+        except Exception as e:
+            print(f"❌ Agent warm-up failed: {e}")
+            raise
+        agent.template_loader.start_watching()
+        prd_agent = agent
+    print(f"📋 Available templates: {prd_agent.get_available_templates()}")
+    print(f"✅ AI Agents server ready in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+def start_warm_up() -> asyncio.Task:
+    """Start the warm-up, or return the one already running; a failed warm-up is retried."""
+    global _warm_up_task
+    if _warm_up_task is None or (_warm_up_task.done() and prd_agent is None):
+        _warm_up_task = asyncio.create_task(_warm_up())
+    return _warm_up_task
+
+async def get_agent() -> "PRDAgent":
+    """Get the global agent, waiting for the warm-up to build it on first use."""
+    if prd_agent is None:
+        try:
+            # Shielded so a client disconnecting does not cancel the warm-up for everyone else
+            await asyncio.shield(start_warm_up())
+        except Exception as e:
+            raise HTTPException(status_code=503, detail=f"Agent unavailable: {str(e)}")
+    return prd_agent
+
+def resolve_session_id(session_id: Optional[str] = None, project_id: Optional[int] = None) -> Optional[str]:
+    """Resolve the session key for a request, preferring an explicit session id."""
+    if session_id:
+        return session_id
+    if project_id is not None:
+        return f"project:{project_id}"
+    return None
+
+def chat_response(response: Dict[str, Any], default_type: str, **fields: Any) -> FastJSONResponse:
+    """Send an agent response as a ``ChatResponse`` body.
+    
+    The agent already built these values, so they are serialized as they
+    are rather than validated again through the response model.
+    """
+    return FastJSONResponse({
+        "content": response["content"],
+        "type": response.get("type", default_type),
+        "requires_input": response.get("requires_input", False),
+        "missing_info": response.get("missing_info"),
+        "metadata": response.get("metadata"),
+        "version": response.get("version"),
+        "patch": response.get("patch"),
+        **fields
+    })
+
+def admission_error(error: AdmissionRejected) -> HTTPException:
+    """Convert an admission rejection into a 429/503 with Retry-After."""
+    return HTTPException(
+        status_code=error.status_code,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+async def run_prd_job(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a queued PRD generation job, waiting out admission rejections.
+    
+    The job fails with the last rejection once ``JOB_ADMISSION_TIMEOUT`` seconds would be exceeded.
+    """
+    agent = await get_agent()
+    job_request = JobRequest(**request)
+    session_id = resolve_session_id(job_request.session_id, job_request.project_id)
+    ephemeral = session_id is None
+    if ephemeral:
+        session_id = f"job:{uuid.uuid4().hex}"
+    
+    try:
+        return await retry_rejected(
+            lambda: agent.chat(
+                user_message=job_request.message,
+                template_type=job_request.template_type,
+                project_context=job_request.project_context,
+                session_id=session_id,
+                generation_mode=job_request.generation_mode,
+                priority=PRIORITY_BULK
+            ),
+            AgentConfig.JOB_ADMISSION_TIMEOUT
+        )
+    finally:
+        if ephemeral:
+            await agent.clear_conversation(session_id)
+
+async def run_spec_job(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a queued spec generation job through the PRD pipeline."""
+    agent = await get_agent()
+    template_type = request.get("template_type")
+    if agent.template_loader.get_template_kind(template_type) != KIND_SPEC:
+        raise ValueError(f"Unknown spec template: {template_type}")
+    return await run_prd_job(request)
+
+job_manager.register("prd", run_prd_job)
+job_manager.register("spec", run_spec_job)
+
+def _cache_counts() -> Dict[tuple, float]:
+    """Hit and miss counts of every cache in front of the model and prompt assembly."""
+    counts = {}
+    if prd_agent is None:
+        return counts
+    if prd_agent.response_cache is not None:
+        stats = prd_agent.response_cache.stats()
+        counts[("response", "hit")] = stats["hits"]
+        counts[("response", "miss")] = stats["misses"]
+    prompts = prd_agent.prompts.stats()
+    counts[("prompt_prefix", "hit")] = prompts["prefix_hits"]
+    counts[("prompt_prefix", "miss")] = prompts["prefix_misses"]
+    counts[("prompt_section", "hit")] = prompts["section_hits"]
+    counts[("prompt_section", "miss")] = prompts["section_misses"]
+    validator = prd_agent.validator.cache_stats()
+    counts[("validator", "hit")] = validator["hits"]
+    counts[("validator", "miss")] = validator["misses"]
+    counts[("singleflight", "hit")] = prd_agent.inflight.stats()["coalesced"]
+    return counts
+
+# Values the agent components already track are read when /metrics is scraped; until the
+# warm-up has built the agent there is nothing in flight and nothing to count
+REGISTRY.counter("pmhelper_cache_requests_total", "Cache lookups by cache and result", ("cache", "result"),
+                 callback=_cache_counts)
+REGISTRY.gauge("pmhelper_llm_in_flight", "Model calls holding an admission slot",
+               callback=lambda: prd_agent.scheduler.stats()["in_flight"] if prd_agent else 0)
+REGISTRY.gauge("pmhelper_llm_queued", "Model calls waiting for an admission slot",
+               callback=lambda: prd_agent.scheduler.stats()["queued_now"] if prd_agent else 0)
+REGISTRY.counter("pmhelper_llm_admission_total", "Model call admission outcomes", ("outcome",),
+                 callback=lambda: {
+                     (outcome,): prd_agent.scheduler.stats()[outcome]
+                     for outcome in ("admitted", "queued", "rejected", "timed_out")
+                 } if prd_agent else {})
+REGISTRY.gauge("pmhelper_sessions_in_memory", "Conversation sessions held in memory",
+               callback=lambda: prd_agent.sessions.stats()["in_memory"] if prd_agent else 0)
+REGISTRY.gauge("pmhelper_jobs", "Background jobs by status", ("status",),
+               callback=lambda: {(status,): count for status, count in job_manager.stats()["status_counts"].items()})
+
+def require_profiler(x_profile: Optional[str]) -> SamplingProfiler:
+    """Get the profiler, checking the admin token."""
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not hmac.compare_digest((x_profile or "").encode(), AgentConfig.PROFILER_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid profiler token")
+    return profiler
+
+# Profiling admin endpoints
+@app.get("/admin/profiles")
+async def list_profiles(x_profile: Optional[str] = Header(None)):
+    """List captured request profiles, newest first."""
+    return {"profiles": await asyncio.to_thread(require_profiler(x_profile).list_profiles)}
+
+@app.get("/admin/profiles/{name}")
+async def get_profile(name: str, x_profile: Optional[str] = Header(None)):
+    """Download a profile's collapsed stacks."""
+    content = await asyncio.to_thread(require_profiler(x_profile).read_profile, name)
+    if content is None:
+        raise HTTPException(status_code=404, detail=f"Profile {name} not found")
+    return Response(content, media_type="text/plain; charset=utf-8")
+
+# Metrics endpoint
+@app.get("/metrics")
+async def metrics():
+    """Metrics in the Prometheus text exposition format."""
+    return Response(REGISTRY.render(), media_type=REGISTRY.CONTENT_TYPE)
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy", "service": "ai-agents"}
 
+# Readiness endpoint
+@app.get("/ready")
+async def readiness_check():
+    """Whether the agent is built and requests are served without waiting for the warm-up."""
+    if prd_agent is not None:
+        return {"status": "ready", "service": "ai-agents"}
+    
+    detail = "warming up"
+    if _warm_up_task is not None and _warm_up_task.done():
+        if _warm_up_task.cancelled():
+            detail = "warm-up cancelled"
+        elif _warm_up_task.exception() is not None:
+            detail = f"warm-up failed: {_warm_up_task.exception()}"
+    return JSONResponse(status_code=503, content={"status": "not_ready", "service": "ai-agents", "detail": detail})
+
 # Agent endpoints
 @app.post("/agents/chat", response_model=ChatResponse)
 async def chat_with_agent(request: ChatRequest):
     """Chat with PRD creation agent."""
+    agent = await get_agent()
     try:
-        response = await prd_agent.chat(
+        response = await agent.chat(
             user_message=request.message,
             template_type=request.template_type,
-            project_context=request.project_context
+            project_context=request.project_context,
+            session_id=resolve_session_id(request.session_id, request.project_id),
+            generation_mode=request.generation_mode
         )
         
-        return ChatResponse(
-            content=response["content"],
-            type=response.get("type", "response"),
-            requires_input=response.get("requires_input", False),
-            missing_info=response.get("missing_info"),
-            metadata=response.get("metadata")
-        )
+        return chat_response(response, "response")
         
+    except AdmissionRejected as e:
+        raise admission_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Agent error: {str(e)}")
 
+async def _sse_events(agent: "PRDAgent", request: ChatRequest) -> AsyncIterator[str]:
+    """Format streamed agent events as Server-Sent Events."""
+    async for event in agent.chat_stream(
+        user_message=request.message,
+        template_type=request.template_type,
+        project_context=request.project_context,
+        session_id=resolve_session_id(request.session_id, request.project_id)
+    ):
+        yield f"event: {event['type']}\ndata: {dumps(event).decode()}\n\n"
+
+@app.post("/agents/chat/stream")
+async def chat_with_agent_stream(request: ChatRequest):
+    """Chat with PRD creation agent, streaming tokens as Server-Sent Events."""
+    # Wait for the agent before the response starts, so a failed warm-up is still a 503
+    agent = await get_agent()
+    return StreamingResponse(
+        _sse_events(agent, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/agents/chat/ws")
+async def chat_with_agent_ws(websocket: WebSocket):
+    """Chat with PRD creation agent over a WebSocket, one JSON request per message."""
+    # Accept first: an HTTPException before the handshake is not something a WebSocket client can read
+    await websocket.accept()
+    try:
+        agent = await get_agent()
+    except HTTPException as e:
+        await websocket.send_json({"type": "error", "content": e.detail})
+        await websocket.close(code=1013)
+        return
+    try:
+        while True:
+            try:
+                request = ChatRequest(**await websocket.receive_json())
+            except (ValueError, TypeError) as e:
+                await websocket.send_json({"type": "error", "content": f"Invalid request: {str(e)}"})
+                continue
+            
+            async for event in agent.chat_stream(
+                user_message=request.message,
+                template_type=request.template_type,
+                project_context=request.project_context,
+                session_id=resolve_session_id(request.session_id, request.project_id)
+            ):
+                await websocket.send_json(event)
+    except WebSocketDisconnect:
+        pass
+
 @app.get("/agents/templates")
-async def get_available_templates():
-    """Get list of available PRD templates."""
+async def get_available_templates(kind: Optional[str] = None):
+    """Get list of available templates, optionally only PRD, spec or PMD templates."""
+    agent = await get_agent()
     try:
-        templates = prd_agent.get_available_templates()
+        templates = agent.get_available_templates(kind)
         return {"templates": templates}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Template error: {str(e)}")
@@ -99,81 +405,316 @@ async def get_available_templates():
 @app.get("/agents/templates/{template_type}", response_model=TemplateInfo)
 async def get_template_info(template_type: str):
     """Get information about a specific template."""
+    agent = await get_agent()
     try:
-        template_info = prd_agent.get_template_info(template_type)
+        template_info = agent.get_template_info(template_type)
         if not template_info:
             raise HTTPException(status_code=404, detail=f"Template {template_type} not found")
         
-        return TemplateInfo(**template_info)
+        return FastJSONResponse(template_info)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Template error: {str(e)}")
 
 @app.get("/agents/conversation", response_model=ConversationHistory)
-async def get_conversation_history():
+async def get_conversation_history(session_id: Optional[str] = None, project_id: Optional[int] = None):
     """Get conversation history."""
+    agent = await get_agent()
     try:
-        history = prd_agent.get_conversation_history()
-        return ConversationHistory(messages=history)
+        history = await agent.get_conversation_history(resolve_session_id(session_id, project_id))
+        return FastJSONResponse({"messages": history})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"History error: {str(e)}")
 
 @app.post("/agents/conversation/clear")
-async def clear_conversation():
+async def clear_conversation(session_id: Optional[str] = None, project_id: Optional[int] = None):
     """Clear conversation history."""
+    agent = await get_agent()
     try:
-        prd_agent.clear_conversation()
+        await agent.clear_conversation(resolve_session_id(session_id, project_id))
         return {"message": "Conversation cleared successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Clear error: {str(e)}")
 
+@app.get("/agents/sections")
+async def get_sections(session_id: Optional[str] = None, project_id: Optional[int] = None):
+    """Get the PRD sections stored for a session."""
+    agent = await get_agent()
+    try:
+        return {"sections": await agent.get_sections(resolve_session_id(session_id, project_id))}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Sections error: {str(e)}")
+
+@app.get("/agents/document")
+async def get_document(session_id: Optional[str] = None, project_id: Optional[int] = None,
+                       version: Optional[int] = None):
+    """Get a session's PRD sections at a version (the latest by default)."""
+    agent = await get_agent()
+    try:
+        document = await agent.get_document(resolve_session_id(session_id, project_id), version)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Document error: {str(e)}")
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"Version {version} not found")
+    return document
+
+@app.get("/agents/document/patches")
+async def get_document_patches(since: int = 0, session_id: Optional[str] = None,
+                               project_id: Optional[int] = None):
+    """Get the section patches needed to bring a client at version ``since`` up to date."""
+    agent = await get_agent()
+    try:
+        patches = await agent.get_patches(resolve_session_id(session_id, project_id), since)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Document error: {str(e)}")
+    if patches is None:
+        raise HTTPException(status_code=404, detail=f"Version {since} not found")
+    return patches
+
+@app.post("/agents/sections/{section_key}/regenerate", response_model=ChatResponse)
+async def regenerate_section(section_key: str, request: SectionRegenerateRequest):
+    """Regenerate a single PRD section, keeping the rest of the document."""
+    agent = await get_agent()
+    try:
+        response = await agent.regenerate_section(
+            section_key,
+            instructions=request.instructions,
+            template_type=request.template_type,
+            project_context=request.project_context,
+            session_id=resolve_session_id(request.session_id, request.project_id)
+        )
+        
+        return chat_response(
+            response, "section_content",
+            requires_input=False, missing_info=None,
+            metadata={**response.get("metadata", {}), "section_key": section_key}
+        )
+        
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except AdmissionRejected as e:
+        raise admission_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Regeneration error: {str(e)}")
+
 # Direct PRD generation endpoint
 @app.post("/agents/generate-prd")
 async def generate_prd_direct(request: ChatRequest):
     """Direct PRD generation without conversation."""
+    agent = await get_agent()
+    # Use a one-off session unless the caller names one explicitly
+    session_id = resolve_session_id(request.session_id, request.project_id)
+    ephemeral = session_id is None
+    if ephemeral:
+        session_id = f"generate:{uuid.uuid4().hex}"
+    
     try:
         # Clear previous conversation for clean generation
-        prd_agent.clear_conversation()
+        await agent.clear_conversation(session_id)
         
-        response = await prd_agent.chat(
+        response = await agent.chat(
             user_message=request.message,
             template_type=request.template_type,
-            project_context=request.project_context
+            project_context=request.project_context,
+            session_id=session_id,
+            generation_mode=request.generation_mode,
+            priority=PRIORITY_BULK,
+            task=TASK_FULL_GENERATION
         )
         
-        return ChatResponse(
-            content=response["content"],
-            type=response.get("type", "prd_content"),
-            requires_input=response.get("requires_input", False),
-            missing_info=response.get("missing_info"),
-            metadata=response.get("metadata")
-        )
+        return chat_response(response, "prd_content")
         
+    except AdmissionRejected as e:
+        raise admission_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Generation error: {str(e)}")
+    finally:
+        if ephemeral:
+            await agent.clear_conversation(session_id)
+
+# Background job endpoints
+@app.post("/agents/jobs", status_code=202)
+async def submit_job(request: JobRequest):
+    """Queue a generation job and return its id immediately."""
+    if not job_manager.has_kind(request.kind):
+        raise HTTPException(status_code=400, detail=f"Unknown job kind: {request.kind}")
+    
+    try:
+        job = await job_manager.submit(request.kind, request.model_dump())
+        return {"job_id": job["job_id"], "status": job["status"]}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Job error: {str(e)}")
+
+@app.get("/agents/jobs")
+async def list_jobs(status: Optional[str] = None, limit: int = 50):
+    """List recent jobs."""
+    try:
+        return {"jobs": job_manager.store.list(status=status, limit=limit)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Job error: {str(e)}")
+
+@app.get("/agents/jobs/stats")
+async def get_job_stats():
+    """Get job queue depth and per-worker throughput."""
+    try:
+        return job_manager.stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Job error: {str(e)}")
+
+@app.get("/agents/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get a job's status and, once finished, its result."""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@app.get("/agents/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Stream a job's state changes as Server-Sent Events until it finishes."""
+    if not job_manager.get(job_id):
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    
+    async def events() -> AsyncIterator[str]:
+        async for job in job_manager.subscribe(job_id):
+            yield f"event: {job['status']}\ndata: {dumps(job).decode()}\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+# Batch PRD generation endpoint
+@app.post("/agents/generate-prd/batch")
+async def generate_prd_batch(request: BatchRequest):
+    """Generate PRDs for many briefs, streaming each result as NDJSON as it finishes."""
+    agent = await get_agent()
+    if len(request.briefs) > AgentConfig.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(request.briefs)} briefs exceeds the limit of {AgentConfig.BATCH_MAX_ITEMS}"
+        )
+    
+    async def results() -> AsyncIterator[bytes]:
+        started = time.perf_counter()
+        succeeded = 0
+        async for item in agent.generate_batch(
+            [brief.model_dump() for brief in request.briefs],
+            concurrency=request.concurrency
+        ):
+            succeeded += item["status"] == "ok"
+            yield dumps({"type": "item", **item}) + b"\n"
+        
+        yield dumps({
+            "type": "summary",
+            "total": len(request.briefs),
+            "succeeded": succeeded,
+            "failed": len(request.briefs) - succeeded,
+            "elapsed_ms": (time.perf_counter() - started) * 1000
+        }) + b"\n"
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
 
 # Validation endpoint
 @app.post("/agents/validate")
 async def validate_prd_input(request: Dict[str, Any]):
     """Validate PRD input for completeness."""
+    agent = await get_agent()
     try:
         user_input = request.get("input", "")
         template_type = request.get("template_type", "lean")
         
-        validation_result = prd_agent.validator.validate_user_input(user_input)
+        validation_result = agent.validator.validate_user_input(user_input)
         
         return {
             "is_sufficient": validation_result["is_sufficient"],
             "completeness_score": validation_result["completeness_score"],
             "missing_info": validation_result["missing_info"],
             "extracted_info": validation_result["extracted_info"],
-            "is_underspecified": prd_agent.validator.is_request_underspecified(user_input)
+            "is_underspecified": agent.validator.is_request_underspecified(user_input)
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Validation error: {str(e)}")
 
+@app.post("/agents/validate/batch")
+async def validate_prd_inputs(request: Dict[str, Any]):
+    """Validate many PRD inputs for completeness."""
+    agent = await get_agent()
+    try:
+        inputs = request.get("inputs", [])
+        return {"results": agent.validator.validate_many(inputs)}
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Validation error: {str(e)}")
+
+# Session statistics endpoint
+@app.get("/agents/sessions/stats")
+async def get_session_stats():
+    """Get session store statistics."""
+    agent = await get_agent()
+    try:
+        return agent.sessions.stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Session error: {str(e)}")
+
+# Response cache endpoints
+@app.get("/agents/cache/stats")
+async def get_cache_stats():
+    """Get response cache hit/miss statistics."""
+    agent = await get_agent()
+    try:
+        if agent.response_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **agent.response_cache.stats()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Cache error: {str(e)}")
+
+@app.get("/agents/inflight/stats")
+async def get_inflight_stats():
+    """Get in-flight request coalescing statistics."""
+    agent = await get_agent()
+    try:
+        return agent.inflight.stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"In-flight error: {str(e)}")
+
+@app.get("/agents/scheduler/stats")
+async def get_scheduler_stats():
+    """Get LLM admission control statistics."""
+    agent = await get_agent()
+    try:
+        return agent.scheduler.stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Scheduler error: {str(e)}")
+
+@app.get("/agents/router/stats")
+async def get_router_stats():
+    """Get model routing policy and per-route latency and token statistics."""
+    agent = await get_agent()
+    try:
+        return agent.router.stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Router error: {str(e)}")
+
+@app.get("/agents/preflight/stats")
+async def get_preflight_stats():
+    """Get counts of requests answered locally instead of calling the model."""
+    agent = await get_agent()
+    try:
+        return agent.preflight.stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Preflight error: {str(e)}")
+
+@app.post("/agents/cache/clear")
+async def clear_cache():
+    """Drop every cached response."""
+    agent = await get_agent()
+    try:
+        if agent.response_cache is not None:
+            agent.response_cache.clear()
+        return {"message": "Cache cleared successfully"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Cache error: {str(e)}")
+
 # Configuration endpoint
 @app.get("/agents/config")
 async def get_agent_config():
@@ -189,31 +730,34 @@ async def get_agent_config():
 # Error handlers
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
-    return {"error": "Endpoint not found", "detail": str(exc)}
+    return JSONResponse(
+        status_code=404, content={"error": "Endpoint not found", "detail": getattr(exc, "detail", str(exc))}
+    )
 
 @app.exception_handler(500)
 async def internal_error_handler(request, exc):
-    return {"error": "Internal server error", "detail": str(exc)}
+    return JSONResponse(status_code=500, content={"error": "Internal server error", "detail": str(exc)})
 
 # Startup event
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup."""
     print("🚀 AI Agents server starting up...")
-    print(f"📋 Available templates: {prd_agent.get_available_templates()}")
-    print("✅ AI Agents server ready!")
+    await job_manager.start()
+    start_warm_up()
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown."""
     print("🛑 AI Agents server shutting down...")
+    await job_manager.stop()
+    if prd_agent is not None:
+        prd_agent.template_loader.stop_watching()
+        await prd_agent.aclose()
+        prd_agent.sessions.flush()
 
 if __name__ == "__main__":
-    # Load environment variables
-    from dotenv import load_dotenv
-    load_dotenv()
-    
     # Validate configuration
     try:
         AgentConfig.validate_config()
@@ -222,11 +766,15 @@ if __name__ == "__main__":
         print(f"❌ Configuration error: {e}")
         exit(1)
     
-    # Run server
+    import uvicorn
+    
+    # Run server; with several workers each process serves any session from the shared SQLite state
+    print(f"🧵 Starting {AgentConfig.WORKERS} worker(s){' with reload' if AgentConfig.RELOAD else ''}")
     uvicorn.run(
         "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
+        host=AgentConfig.HOST,
+        port=AgentConfig.PORT,
+        workers=AgentConfig.WORKERS,
+        reload=AgentConfig.RELOAD,
         log_level="info"
     )
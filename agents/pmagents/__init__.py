@@ -1,5 +1,61 @@
 """Agents module for AI PRD creation."""
 
-from .prd_agent import PRDAgent
+import importlib
+from typing import TYPE_CHECKING
 
-__all__ = ["PRDAgent"]
+# Exports are imported from their submodule on first access, so importing the
+# light parts of the package (jobs, scheduler) does not load the Agents SDK
+_EXPORTS = {
+    "PRDAgent": ".prd_agent",
+    "SessionManager": ".session_store",
+    "SessionState": ".session_store",
+    "ResponseCache": ".response_cache",
+    "SingleFlight": ".singleflight",
+    "LLMScheduler": ".scheduler",
+    "AdmissionRejected": ".scheduler",
+    "PRIORITY_INTERACTIVE": ".scheduler",
+    "PRIORITY_BULK": ".scheduler",
+    "retry_rejected": ".scheduler",
+    "JobManager": ".jobs",
+    "JobStore": ".jobs",
+    "AgentRegistry": ".agent_registry",
+    "PRDRunContext": ".agent_registry",
+    "ContextWindowManager": ".context_window",
+    "count_tokens": ".context_window",
+    "PreflightGate": ".preflight",
+    "PRDDocument": ".prd_document",
+    "ModelRouter": ".model_router",
+    "RoutingPolicy": ".model_router",
+    "RouteDecision": ".model_router",
+    "TASK_CLARIFICATION": ".model_router",
+    "TASK_SECTION_EDIT": ".model_router",
+    "TASK_FULL_GENERATION": ".model_router",
+}
+
+if TYPE_CHECKING:  # pragma: no cover - static analysis only
+    from .prd_agent import PRDAgent
+    from .session_store import SessionManager, SessionState
+    from .response_cache import ResponseCache
+    from .singleflight import SingleFlight
+    from .scheduler import LLMScheduler, AdmissionRejected, PRIORITY_INTERACTIVE, PRIORITY_BULK, retry_rejected
+    from .jobs import JobManager, JobStore
+    from .agent_registry import AgentRegistry, PRDRunContext
+    from .context_window import ContextWindowManager, count_tokens
+    from .preflight import PreflightGate
+    from .prd_document import PRDDocument
+    from .model_router import (
+        ModelRouter, RoutingPolicy, RouteDecision,
+        TASK_CLARIFICATION, TASK_SECTION_EDIT, TASK_FULL_GENERATION
+    )
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+__all__ = list(_EXPORTS)
@@ -0,0 +1,74 @@
+"""Registry of pre-built agents shared across requests."""
+
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from agents import Agent, ModelSettings, RunContextWrapper
+
+from config import AgentConfig
+from prompts import SystemPrompts
+
+
+class PRDRunContext:
+    """Per-request context passed to a shared agent run."""
+
+    __slots__ = ("instructions", "template_type", "history", "context_usage")
+
+    def __init__(self, instructions: str, template_type: str, history: str = "",
+                 context_usage: Optional[Dict[str, Any]] = None):
+        self.instructions = instructions
+        self.template_type = template_type
+        self.history = history
+        self.context_usage = context_usage
+
+
+def _context_instructions(context: RunContextWrapper[PRDRunContext], agent: Agent) -> str:
+    """Resolve an agent's instructions from the per-request run context."""
+    return context.context.instructions
+
+
+class AgentRegistry:
+    """Builds each agent once per (template_type, model, prompt version).
+
+    Agents take their system prompt from the ``PRDRunContext`` passed to
+    ``Runner.run``, so per-request content such as the current PRD never
+    requires building a new agent. Every agent runs with the configured
+    ``TEMPERATURE`` and ``MAX_TOKENS``.
+    """
+
+    def __init__(self, name: str = AgentConfig.AGENT_NAME, default_model: Optional[str] = None):
+        self.name = name
+        self.default_model = default_model or AgentConfig.get_model_name()
+        self._agents: Dict[Tuple[str, str, str], Agent] = {}
+        self._lock = threading.Lock()
+
+    def get(self, template_type: str, model: Optional[str] = None) -> Agent:
+        """Get the shared agent for a template and model."""
+        key = (template_type, model or self.default_model, SystemPrompts.PROMPT_VERSION)
+
+        agent = self._agents.get(key)
+        if agent is None:
+            with self._lock:
+                agent = self._agents.get(key)
+                if agent is None:
+                    agent = Agent(
+                        name=self.name,
+                        instructions=_context_instructions,
+                        model=key[1],
+                        model_settings=ModelSettings(
+                            temperature=AgentConfig.TEMPERATURE,
+                            max_tokens=AgentConfig.MAX_TOKENS
+                        )
+                    )
+                    self._agents[key] = agent
+        return agent
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the registered agent keys."""
+        return {
+            "agents": len(self._agents),
+            "keys": [
+                {"template_type": template_type, "model": model, "prompt_version": version}
+                for template_type, model, version in self._agents
+            ],
+        }
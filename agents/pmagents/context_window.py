@@ -0,0 +1,195 @@
+"""Token-budgeted selection of PRD content and conversation history."""
+
+import re
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - counts fall back to an estimate
+    tiktoken = None
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        try:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoding = False
+    return _encoding or None
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    """Count tokens locally, using tiktoken when installed and ~4 chars/token otherwise."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+class ContextPlan:
+    """The content selected for one model request and its token accounting."""
+
+    __slots__ = ("prd_sections", "history_text", "usage")
+
+    def __init__(self, prd_sections: Dict[str, Any], history_text: str, usage: Dict[str, Any]):
+        self.prd_sections = prd_sections
+        self.history_text = history_text
+        self.usage = usage
+
+
+class ContextWindowManager:
+    """Fits PRD sections and conversation history into a per-request token budget.
+
+    The static system prompt and the user message are always kept. The
+    remaining budget goes first to PRD sections, most relevant to the user
+    message first, then to the most recent turns verbatim. Older turns are
+    compacted into one-line summaries, cached per message, and the oldest
+    summaries are dropped when even those do not fit.
+    """
+
+    def __init__(self, budget_tokens: int = 12000, reserve_output_tokens: int = 2000,
+                 recent_turns: int = 6, summary_chars: int = 200, max_cached_summaries: int = 4096):
+        self.budget_tokens = budget_tokens
+        self.reserve_output_tokens = reserve_output_tokens
+        self.recent_turns = recent_turns
+        self.summary_chars = summary_chars
+        self.max_cached_summaries = max_cached_summaries
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+
+    def plan(self, system_prompt: str, prd_sections: Dict[str, Any],
+             history: List[Dict[str, Any]], user_message: str,
+             reserve_output_tokens: Optional[int] = None) -> ContextPlan:
+        """Select the PRD sections and history to send with a request.
+
+        ``reserve_output_tokens`` overrides the default output reservation,
+        e.g. with an estimate derived from a template's length limits.
+        """
+        reserve = self.reserve_output_tokens if reserve_output_tokens is None else reserve_output_tokens
+        input_budget = self.budget_tokens - min(reserve, self.budget_tokens)
+        system_tokens = count_tokens(system_prompt)
+        message_tokens = count_tokens(user_message)
+        available = max(0, input_budget - system_tokens - message_tokens)
+
+        included, omitted, prd_tokens = self._select_sections(prd_sections, user_message, available)
+        available -= prd_tokens
+
+        history_text, turn_counts, history_tokens = self._select_history(history, available)
+
+        usage = {
+            "budget_tokens": self.budget_tokens,
+            "input_budget_tokens": input_budget,
+            "reserve_output_tokens": reserve,
+            "used_tokens": system_tokens + message_tokens + prd_tokens + history_tokens,
+            # Counts are estimates, possibly over budget, when tiktoken is missing
+            "token_counter": "tiktoken" if _get_encoding() is not None else "estimate",
+            "system_tokens": system_tokens,
+            "message_tokens": message_tokens,
+            "prd_tokens": prd_tokens,
+            "history_tokens": history_tokens,
+            "sections_included": list(included),
+            "sections_omitted": omitted,
+            **turn_counts,
+        }
+        return ContextPlan(included, history_text, usage)
+
+    def _select_sections(self, prd_sections: Dict[str, Any], user_message: str,
+                         available: int):
+        """Keep the most relevant sections that fit, preserving their original order."""
+        if not prd_sections:
+            return {}, [], 0
+
+        message_words = set(_WORD_PATTERN.findall(user_message.lower()))
+        costs = {key: count_tokens(self._section_text(key, value)) for key, value in prd_sections.items()}
+        order = list(prd_sections)
+        position = {key: index for index, key in enumerate(order)}
+        ranked = sorted(order, key=lambda key: (-self._relevance(key, message_words), position[key]))
+
+        kept = set()
+        used = 0
+        for key in ranked:
+            if used + costs[key] <= available:
+                kept.add(key)
+                used += costs[key]
+
+        included = {key: prd_sections[key] for key in order if key in kept}
+        omitted = [key for key in order if key not in kept]
+        return included, omitted, used
+
+    def _select_history(self, history: List[Dict[str, Any]], available: int):
+        """Keep recent turns verbatim and summarize older ones, newest first."""
+        recent_lines: List[str] = []
+        used = 0
+        verbatim_start = len(history)
+        for index in range(len(history) - 1, len(history) - 1 - self.recent_turns, -1):
+            if index < 0:
+                break
+            message = history[index]
+            line = f"{message.get('role', 'user')}: {message.get('content', '')}"
+            cost = count_tokens(line)
+            if used + cost > available:
+                break
+            recent_lines.insert(0, line)
+            used += cost
+            verbatim_start = index
+
+        older = history[:verbatim_start]
+        dropped = 0
+        summary_lines: List[str] = []
+        for message in reversed(older):
+            line = f"- {message.get('role', 'user')}: {self._summarize(message.get('content', ''))}"
+            cost = count_tokens(line)
+            if used + cost > available:
+                dropped = len(older) - len(summary_lines)
+                break
+            summary_lines.insert(0, line)
+            used += cost
+
+        parts = []
+        if summary_lines:
+            parts.append("Earlier conversation (summarized):\n" + "\n".join(summary_lines))
+        if recent_lines:
+            parts.append("Recent conversation:\n" + "\n".join(recent_lines))
+
+        counts = {
+            "turns_verbatim": len(recent_lines),
+            "turns_summarized": len(summary_lines),
+            "turns_dropped": dropped,
+        }
+        return "\n\n".join(parts), counts, used
+
+    def _summarize(self, content: str) -> str:
+        """Compact a message to its first sentence, cached per message."""
+        summary = self._summaries.get(content)
+        if summary is not None:
+            self._summaries.move_to_end(content)
+            return summary
+
+        text = " ".join(str(content).split())
+        summary = _SENTENCE_END.split(text, 1)[0]
+        if len(summary) > self.summary_chars:
+            summary = summary[:self.summary_chars].rstrip() + "…"
+
+        self._summaries[content] = summary
+        while len(self._summaries) > self.max_cached_summaries:
+            self._summaries.popitem(last=False)
+        return summary
+
+    @staticmethod
+    def _relevance(key: str, message_words: set) -> int:
+        """Score a section by how many of its key's words the user message mentions."""
+        key_words = set(_WORD_PATTERN.findall(re.sub(r"([a-z])([A-Z])", r"\1 \2", key).lower()))
+        return len(key_words & message_words)
+
+    @staticmethod
+    def _section_text(key: str, value: Any) -> str:
+        return f"### {key}\n{value}"
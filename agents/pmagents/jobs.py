@@ -0,0 +1,381 @@
+"""Background job queue for long-running generations."""
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from .storage import Database, ensure_column
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+TERMINAL_STATUSES = (JOB_SUCCEEDED, JOB_FAILED)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+def process_start(pid: int) -> Optional[str]:
+    """A token for one run of a process, so a later process given the same pid does not match it.
+
+    Built from the boot id and the process's start time on Linux; None
+    where these are not available.
+    """
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as boot_id, open(f"/proc/{pid}/stat", "rb") as stat:
+            boot = boot_id.read().strip()
+            # Fields after the parenthesised command name, which may contain spaces, start at the third
+            started = stat.read().rsplit(b")", 1)[1].split()[19].decode()
+    except (OSError, IndexError):
+        return None
+    return f"{boot}:{started}"
+
+
+class JobStore:
+    """SQLite-backed persistence for job state.
+
+    Each job records the ``owner`` process id that queued or runs it, and
+    that process's ``owner_start`` token, so worker processes sharing the
+    file only recover jobs whose owner died. Writes wait on other
+    processes' transactions, so async callers run them on a worker thread.
+    """
+
+    COLUMNS = ("job_id", "kind", "status", "request", "result", "error",
+               "worker", "owner", "owner_start", "created_at", "started_at", "finished_at")
+
+    def __init__(self, db_path: str = ":memory:"):
+        self._db = Database(db_path)
+        self._db.write(self._create_schema)
+
+    @staticmethod
+    def _create_schema(db: sqlite3.Connection):
+        """Create the jobs table, or upgrade one from an older version."""
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, "
+            "request TEXT NOT NULL, result TEXT, error TEXT, worker INTEGER, owner INTEGER, "
+            "owner_start TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+        ensure_column(db, "jobs", "owner", "INTEGER")
+        ensure_column(db, "jobs", "owner_start", "TEXT")
+        db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    def create(self, kind: str, request: Dict[str, Any], owner: Optional[int] = None,
+               owner_start: Optional[str] = None) -> Dict[str, Any]:
+        """Insert a new queued job."""
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": JOB_QUEUED,
+            "request": request,
+            "result": None,
+            "error": None,
+            "worker": None,
+            "owner": owner,
+            "owner_start": owner_start,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        self._db.write(lambda db: db.execute(
+            f"INSERT INTO jobs ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+            self._to_row(job)
+        ))
+        return job
+
+    def update(self, job_id: str, **fields: Any):
+        """Update fields of a job."""
+        if not fields:
+            return
+
+        for key in ("request", "result"):
+            if key in fields and fields[key] is not None:
+                fields[key] = json.dumps(fields[key])
+
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        self._db.write(lambda db: db.execute(
+            f"UPDATE jobs SET {assignments} WHERE job_id = ?",
+            (*fields.values(), job_id)
+        ))
+
+    def claim(self, job_id: str, worker: int, owner: int, owner_start: Optional[str] = None) -> bool:
+        """Mark a queued job running; False if another worker got to it first."""
+        cursor = self._db.write(lambda db: db.execute(
+            "UPDATE jobs SET status = ?, worker = ?, owner = ?, owner_start = ?, started_at = ? "
+            "WHERE job_id = ? AND status = ?",
+            (JOB_RUNNING, worker, owner, owner_start, time.time(), job_id, JOB_QUEUED)
+        ))
+        return cursor.rowcount == 1
+
+    def requeue(self, job_id: str, previous_owner: Optional[int], owner: int,
+                owner_start: Optional[str] = None) -> bool:
+        """Take over an unfinished job from a dead owner; False if another process already did."""
+        cursor = self._db.write(lambda db: db.execute(
+            "UPDATE jobs SET status = ?, worker = NULL, owner = ?, owner_start = ?, started_at = NULL "
+            "WHERE job_id = ? AND status IN (?, ?) AND owner IS ?",
+            (JOB_QUEUED, owner, owner_start, job_id, JOB_QUEUED, JOB_RUNNING, previous_owner)
+        ))
+        return cursor.rowcount == 1
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job by id."""
+        rows = self._db.read(f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,))
+        return self._from_row(rows[0]) if rows else None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """List recent jobs, newest first."""
+        query = f"SELECT {', '.join(self.COLUMNS)} FROM jobs"
+        params: List[Any] = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+
+        rows = self._db.read(query, params)
+        return [self._from_row(row) for row in rows]
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        """Jobs that were queued or running when the service last stopped, oldest first."""
+        rows = self._db.read(
+            f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+            (JOB_QUEUED, JOB_RUNNING)
+        )
+        return [self._from_row(row) for row in rows]
+
+    def purge(self, before: float) -> int:
+        """Delete succeeded and failed jobs that finished before a timestamp; returns how many."""
+        cursor = self._db.write(lambda db: db.execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+            (*TERMINAL_STATUSES, before)
+        ))
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """Count jobs per status."""
+        return dict(self._db.read("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+
+    def _to_row(self, job: Dict[str, Any]) -> tuple:
+        row = dict(job)
+        row["request"] = json.dumps(row["request"])
+        row["result"] = json.dumps(row["result"]) if row["result"] is not None else None
+        return tuple(row[column] for column in self.COLUMNS)
+
+    def _from_row(self, row: tuple) -> Dict[str, Any]:
+        job = dict(zip(self.COLUMNS, row))
+        job["request"] = json.loads(job["request"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+
+class JobManager:
+    """Runs queued jobs on a pool of asyncio workers.
+
+    Handlers are registered per job kind and receive the job's request dict.
+    Jobs left queued or running by a process that is no longer alive are
+    re-queued on start. Several server processes can share one store: each
+    runs the jobs submitted to it, and subscribers poll the store every
+    ``poll_interval`` seconds to follow jobs another process runs. Finished
+    jobs older than ``retention_seconds`` are deleted every
+    ``purge_interval`` seconds; a retention of 0 keeps them forever.
+    """
+
+    def __init__(self, store: JobStore, num_workers: int = 4, poll_interval: float = 1.0,
+                 retention_seconds: float = 0, purge_interval: float = 60.0):
+        self.store = store
+        self.num_workers = max(1, num_workers)
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self.purge_interval = purge_interval
+        self.owner = os.getpid()
+        self.owner_start = process_start(self.owner)
+        self._handlers: Dict[str, JobHandler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._purger: Optional[asyncio.Task] = None
+        self._purged = 0
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._started_at = 0.0
+        self._worker_stats: List[Dict[str, Any]] = []
+
+    def register(self, kind: str, handler: JobHandler):
+        """Register the coroutine that runs jobs of a kind."""
+        self._handlers[kind] = handler
+
+    def has_kind(self, kind: str) -> bool:
+        """Whether a handler is registered for a kind."""
+        return kind in self._handlers
+
+    async def start(self):
+        """Start the worker pool and resume unfinished jobs."""
+        if self._workers:
+            return
+
+        self._queue = asyncio.Queue()
+        self._started_at = time.time()
+        self._worker_stats = [
+            {"worker": index, "completed": 0, "failed": 0, "busy_seconds": 0.0, "current_job": None}
+            for index in range(self.num_workers)
+        ]
+
+        for job in self.store.unfinished():
+            if self._owner_alive(job["owner"], job["owner_start"]):
+                continue
+            if await asyncio.to_thread(self.store.requeue, job["job_id"], job["owner"],
+                                       self.owner, self.owner_start):
+                self._queue.put_nowait(job["job_id"])
+
+        self._workers = [
+            asyncio.create_task(self._worker(index)) for index in range(self.num_workers)
+        ]
+        if self.retention_seconds > 0:
+            self._purger = asyncio.create_task(self._purge_loop())
+
+    async def stop(self):
+        """Stop the workers; running jobs are resumed on the next start."""
+        tasks = self._workers + ([self._purger] if self._purger else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._purger = None
+
+    async def submit(self, kind: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue a job and return its initial state."""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if self._queue is None:
+            raise RuntimeError("Job workers are not running")
+
+        job = await asyncio.to_thread(self.store.create, kind, request, self.owner, self.owner_start)
+        self._queue.put_nowait(job["job_id"])
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job's current state."""
+        return self.store.get(job_id)
+
+    async def subscribe(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the job's state now and on every change until it finishes."""
+        updates: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, []).append(updates)
+        try:
+            job = self.store.get(job_id)
+            while job is not None:
+                yield job
+                if job["status"] in TERMINAL_STATUSES:
+                    break
+                job = await self._next_update(job, updates)
+        finally:
+            self._subscribers[job_id].remove(updates)
+            if not self._subscribers[job_id]:
+                del self._subscribers[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        """Get queue depth, status counts and per-worker throughput."""
+        uptime = time.time() - self._started_at if self._started_at else 0.0
+        workers = [
+            {
+                **worker,
+                "jobs_per_minute": worker["completed"] / uptime * 60 if uptime else 0.0,
+                "utilization": worker["busy_seconds"] / uptime if uptime else 0.0,
+            }
+            for worker in self._worker_stats
+        ]
+        completed = sum(worker["completed"] for worker in self._worker_stats)
+        return {
+            "workers": workers,
+            "num_workers": self.num_workers,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "status_counts": self.store.counts(),
+            "purged": self._purged,
+            "uptime_seconds": uptime,
+            "jobs_per_minute": completed / uptime * 60 if uptime else 0.0,
+        }
+
+    async def _worker(self, index: int):
+        """Pull job ids off the queue and run them."""
+        stats = self._worker_stats[index]
+        while True:
+            job_id = await self._queue.get()
+            job = self.store.get(job_id)
+            if job is None or not await asyncio.to_thread(
+                    self.store.claim, job_id, index, self.owner, self.owner_start):
+                continue
+
+            started_at = time.time()
+            stats["current_job"] = job_id
+            self._notify(job_id)
+
+            try:
+                result = await self._handlers[job["kind"]](job["request"])
+                await self._transition(job_id, status=JOB_SUCCEEDED, result=result, finished_at=time.time())
+                stats["completed"] += 1
+            except asyncio.CancelledError:
+                # Leave the job running in the store so it resumes after restart
+                raise
+            except Exception as e:
+                await self._transition(job_id, status=JOB_FAILED, error=str(e), finished_at=time.time())
+                stats["failed"] += 1
+            finally:
+                stats["busy_seconds"] += time.time() - started_at
+                stats["current_job"] = None
+
+    async def _purge_loop(self):
+        """Delete finished jobs past the retention period, now and every ``purge_interval`` seconds."""
+        while True:
+            cutoff = time.time() - self.retention_seconds
+            try:
+                self._purged += await asyncio.to_thread(self.store.purge, cutoff)
+            except sqlite3.OperationalError:
+                # Another process held the database too long; try again next round
+                pass
+            await asyncio.sleep(self.purge_interval)
+
+    async def _next_update(self, job: Dict[str, Any], updates: asyncio.Queue) -> Optional[Dict[str, Any]]:
+        """Wait for a job's next state, from this process's workers or, polling, from another's."""
+        while True:
+            try:
+                return await asyncio.wait_for(updates.get(), self.poll_interval)
+            except asyncio.TimeoutError:
+                latest = self.store.get(job["job_id"])
+                if latest != job:
+                    return latest
+
+    def _owner_alive(self, owner: Optional[int], owner_start: Optional[str]) -> bool:
+        """Whether the process that owns a job is still running.
+
+        This process only just started, so jobs it appears to own are from
+        an earlier process that had the same id. A live process whose start
+        token differs from the job's is a later one that reused the id.
+        """
+        if owner is None or owner == self.owner:
+            return False
+        try:
+            os.kill(owner, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        if owner_start is not None:
+            current = process_start(owner)
+            if current is not None and current != owner_start:
+                return False
+        return True
+
+    async def _transition(self, job_id: str, **fields: Any):
+        """Persist a state change and notify subscribers."""
+        await asyncio.to_thread(self.store.update, job_id, **fields)
+        self._notify(job_id)
+
+    def _notify(self, job_id: str):
+        """Send a job's current state to this process's subscribers."""
+        subscribers = self._subscribers.get(job_id)
+        if subscribers:
+            job = self.store.get(job_id)
+            for updates in subscribers:
+                updates.put_nowait(job)
@@ -0,0 +1,146 @@
+"""Cost- and latency-aware routing between a small and a large model."""
+
+import threading
+from typing import Any, Dict, Iterable, List
+
+TASK_CLARIFICATION = "clarification"
+TASK_SECTION_EDIT = "section_edit"
+TASK_FULL_GENERATION = "full_generation"
+
+ROUTE_SMALL = "small"
+ROUTE_LARGE = "large"
+
+
+class RoutingPolicy:
+    """Rules for choosing the small or the large model.
+
+    Clarification turns always use the small model. Section edits use it
+    unless the template is one of ``large_templates``, and full generations
+    use the large model. Any prompt of ``large_prompt_tokens`` or more goes
+    to the large model. Requests whose validator completeness score is below
+    ``clarification_max_completeness`` are treated as clarification turns.
+    """
+
+    __slots__ = ("small_model", "large_model", "large_templates", "large_prompt_tokens",
+                 "clarification_max_completeness")
+
+    def __init__(self, small_model: str, large_model: str, large_templates: Iterable[str] = (),
+                 large_prompt_tokens: int = 6000, clarification_max_completeness: float = 0.4):
+        self.small_model = small_model
+        self.large_model = large_model
+        self.large_templates = frozenset(large_templates)
+        self.large_prompt_tokens = large_prompt_tokens
+        self.clarification_max_completeness = clarification_max_completeness
+
+    def classify(self, completeness: float, has_prd: bool = False) -> str:
+        """Infer the task type of a chat turn."""
+        if has_prd:
+            return TASK_SECTION_EDIT
+        if completeness < self.clarification_max_completeness:
+            return TASK_CLARIFICATION
+        return TASK_FULL_GENERATION
+
+    def choose(self, task: str, template_type: str, prompt_tokens: int):
+        """Return the route name and the reason it was chosen."""
+        if prompt_tokens >= self.large_prompt_tokens:
+            return ROUTE_LARGE, "prompt_tokens"
+        if task == TASK_CLARIFICATION:
+            return ROUTE_SMALL, "task"
+        if task == TASK_SECTION_EDIT:
+            if template_type in self.large_templates:
+                return ROUTE_LARGE, "template"
+            return ROUTE_SMALL, "task"
+        return ROUTE_LARGE, "task"
+
+    def model_for(self, route: str) -> str:
+        return self.large_model if route == ROUTE_LARGE else self.small_model
+
+
+class RouteDecision:
+    """The model chosen for one request and why."""
+
+    __slots__ = ("route", "model", "task", "reason")
+
+    def __init__(self, route: str, model: str, task: str, reason: str):
+        self.route = route
+        self.model = model
+        self.task = task
+        self.reason = reason
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"route": self.route, "model": self.model, "task": self.task, "reason": self.reason}
+
+
+class ModelRouter:
+    """Picks a model per request and records latency and tokens per route."""
+
+    def __init__(self, policy: RoutingPolicy, enabled: bool = True, max_samples: int = 1000):
+        self.policy = policy
+        self.enabled = enabled
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._routes: Dict[str, Dict[str, Any]] = {}
+
+    def route(self, task: str, template_type: str, prompt_tokens: int = 0) -> RouteDecision:
+        """Choose the model for a request."""
+        if not self.enabled:
+            route, reason = ROUTE_LARGE, "disabled"
+        else:
+            route, reason = self.policy.choose(task, template_type, prompt_tokens)
+        return RouteDecision(route, self.policy.model_for(route), task, reason)
+
+    def classify(self, completeness: float, has_prd: bool = False) -> str:
+        """Infer the task type of a chat turn."""
+        return self.policy.classify(completeness, has_prd)
+
+    def record(self, decision: RouteDecision, latency_seconds: float,
+               input_tokens: int = 0, output_tokens: int = 0):
+        """Record one completed model call on a route."""
+        with self._lock:
+            stats = self._routes.get(decision.route)
+            if stats is None:
+                stats = self._routes[decision.route] = {
+                    "model": decision.model, "calls": 0, "input_tokens": 0,
+                    "output_tokens": 0, "tasks": {}, "latencies": [],
+                }
+            stats["model"] = decision.model
+            stats["calls"] += 1
+            stats["input_tokens"] += input_tokens
+            stats["output_tokens"] += output_tokens
+            stats["tasks"][decision.task] = stats["tasks"].get(decision.task, 0) + 1
+            stats["latencies"].append(latency_seconds)
+            if len(stats["latencies"]) > self.max_samples:
+                del stats["latencies"][:-self.max_samples]
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the policy and per-route call counts, tokens and latency percentiles."""
+        with self._lock:
+            routes = {}
+            for route, stats in self._routes.items():
+                latencies = sorted(stats["latencies"])
+                routes[route] = {
+                    "model": stats["model"],
+                    "calls": stats["calls"],
+                    "tasks": dict(stats["tasks"]),
+                    "input_tokens": stats["input_tokens"],
+                    "output_tokens": stats["output_tokens"],
+                    "latency_p50_ms": self._percentile(latencies, 0.50) * 1000,
+                    "latency_p95_ms": self._percentile(latencies, 0.95) * 1000,
+                    "latency_avg_ms": (sum(latencies) / len(latencies) * 1000) if latencies else 0.0,
+                }
+        return {
+            "enabled": self.enabled,
+            "small_model": self.policy.small_model,
+            "large_model": self.policy.large_model,
+            "large_templates": sorted(self.policy.large_templates),
+            "large_prompt_tokens": self.policy.large_prompt_tokens,
+            "clarification_max_completeness": self.policy.clarification_max_completeness,
+            "routes": routes,
+        }
+
+    @staticmethod
+    def _percentile(values: List[float], fraction: float) -> float:
+        if not values:
+            return 0.0
+        index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+        return values[index]
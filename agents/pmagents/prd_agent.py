@@ -1,46 +1,301 @@
 """PRD creation agent using OpenAI Agents SDK."""
 
-import json
-from typing import Dict, Any, List, Optional
-from agents import Agent, Runner, set_default_openai_key
+import time
+import asyncio
+from typing import Dict, Any, List, Optional, AsyncIterator
+from agents import Agent, Runner, RunConfig
+from openai.types.responses import ResponseTextDeltaEvent
 
 from config import AgentConfig
-from tools import TemplateLoader, PRDValidator
-from prompts import SystemPrompts
+from providers import LLMProvider, create_provider, close_http_clients
+from tools import TemplateLoader, PRDValidator, SectionParser
+from prompts import SystemPrompts, PromptAssembler
+from telemetry import (
+    PROMPT_BUILD_SECONDS, QUEUE_WAIT_SECONDS, MODEL_TTFT_SECONDS, MODEL_SECONDS, MODEL_TOKENS, record_timing
+)
+from .session_store import SessionManager, SessionState
+from .response_cache import ResponseCache
+from .singleflight import SingleFlight
+from .scheduler import LLMScheduler, AdmissionRejected, PRIORITY_INTERACTIVE, PRIORITY_BULK, retry_rejected
+from .agent_registry import AgentRegistry, PRDRunContext
+from .context_window import ContextWindowManager
+from .preflight import PreflightGate
+from .model_router import (
+    ModelRouter, RoutingPolicy, RouteDecision,
+    TASK_SECTION_EDIT, TASK_FULL_GENERATION
+)
 
 class PRDAgent:
     """AI agent for PRD creation and management."""
     
-    def __init__(self):
-        AgentConfig.validate_config()
-        
-        # Set up OpenAI key for agents SDK
-        set_default_openai_key(AgentConfig.OPENAI_API_KEY)
+    def __init__(self, provider: Optional[LLMProvider] = None):
+        # Model calls go through the configured provider, which shares one
+        # keep-alive connection pool across every request. A provider passed
+        # in is only checked against its own requirements.
+        if provider is None:
+            AgentConfig.validate_config()
+            provider = create_provider()
+        self.provider = provider
+        self.provider.validate()
+        self.run_config = RunConfig(
+            model_provider=self.provider,
+            tracing_disabled=not (AgentConfig.SDK_TRACING_ENABLED and self.provider.traced)
+        )
         
-        self.template_loader = TemplateLoader(AgentConfig.TEMPLATES_PATH)
+        self.template_loader = TemplateLoader(AgentConfig.TEMPLATES_PATH, AgentConfig.TEMPLATE_POLL_INTERVAL)
         self.validator = PRDValidator()
+        self.prompts = PromptAssembler()
         
-        # Create the agent without custom tools - use conversational approach
-        self.agent = Agent(
-            name=AgentConfig.AGENT_NAME,
-            instructions=self._get_base_instructions(),
-            model=AgentConfig.OPENAI_MODEL
+        # Pre-render each template's static prompt now and whenever its file changes
+        self.template_loader.add_listener(self._render_template_prompts)
+        self._render_template_prompts(self.template_loader.get_available_templates())
+        self.context_window = ContextWindowManager(
+            budget_tokens=AgentConfig.CONTEXT_TOKEN_BUDGET,
+            reserve_output_tokens=AgentConfig.MAX_TOKENS,
+            recent_turns=AgentConfig.CONTEXT_RECENT_TURNS
         )
         
-        self.conversation_history: List[Dict[str, Any]] = []
-        self.current_template: Optional[str] = None
-        self.current_prd_data: Dict[str, Any] = {}
-    
-    def _get_base_instructions(self) -> str:
-        """Get base instructions for the agent."""
-        return SystemPrompts.BASE_SYSTEM_PROMPT
+        # Agents are built once per template and model, then reused across requests
+        self.agents = AgentRegistry(AgentConfig.AGENT_NAME, default_model=self.provider.default_model)
+        
+        self.router = ModelRouter(
+            RoutingPolicy(
+                small_model=AgentConfig.ROUTER_SMALL_MODEL or self.provider.default_model,
+                large_model=AgentConfig.ROUTER_LARGE_MODEL or self.provider.default_model,
+                large_templates=AgentConfig.ROUTER_LARGE_TEMPLATES,
+                large_prompt_tokens=AgentConfig.ROUTER_LARGE_PROMPT_TOKENS,
+                clarification_max_completeness=AgentConfig.ROUTER_CLARIFICATION_MAX_COMPLETENESS
+            ),
+            enabled=AgentConfig.ROUTER_ENABLED
+        )
+        
+        self.preflight = PreflightGate(
+            self.validator,
+            default_threshold=AgentConfig.PREFLIGHT_MAX_COMPLETENESS,
+            template_thresholds=AgentConfig.PREFLIGHT_TEMPLATE_THRESHOLDS,
+            enabled=AgentConfig.PREFLIGHT_ENABLED
+        )
+        
+        self.sessions = SessionManager(
+            max_sessions=AgentConfig.SESSION_MAX_IN_MEMORY,
+            ttl_seconds=AgentConfig.SESSION_TTL_SECONDS,
+            db_path=AgentConfig.SESSION_DB_PATH,
+            max_history=AgentConfig.SESSION_MAX_HISTORY,
+            shared=AgentConfig.SESSION_SHARED,
+            max_versions=AgentConfig.DOCUMENT_MAX_VERSIONS
+        )
+        self.inflight = SingleFlight()
+        self.scheduler = LLMScheduler(
+            max_in_flight=AgentConfig.LLM_MAX_IN_FLIGHT,
+            max_in_flight_per_project=AgentConfig.LLM_MAX_IN_FLIGHT_PER_PROJECT,
+            max_queue=AgentConfig.LLM_MAX_QUEUE,
+            queue_timeout=AgentConfig.LLM_QUEUE_TIMEOUT
+        )
+        self.response_cache: Optional[ResponseCache] = None
+        if AgentConfig.CACHE_ENABLED:
+            self.response_cache = ResponseCache(
+                max_entries=AgentConfig.CACHE_MAX_ENTRIES,
+                max_bytes=AgentConfig.CACHE_MAX_BYTES,
+                ttl_seconds=AgentConfig.CACHE_TTL_SECONDS,
+                db_path=AgentConfig.CACHE_DB_PATH or None,
+                db_max_bytes=AgentConfig.CACHE_DB_MAX_BYTES,
+                db_prune_interval=AgentConfig.CACHE_DB_PRUNE_INTERVAL
+            )
     
     async def chat(self, user_message: str, template_type: str = "lean", 
-                   project_context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """Main chat interface for PRD creation."""
+                   project_context: Optional[Dict[str, Any]] = None,
+                   session_id: Optional[str] = None,
+                   generation_mode: str = "single",
+                   priority: int = PRIORITY_INTERACTIVE,
+                   task: Optional[str] = None) -> Dict[str, Any]:
+        """Main chat interface for PRD creation.
+        
+        ``generation_mode`` is ``"single"`` to write the whole PRD in one model
+        call or ``"sections"`` to generate each template section concurrently.
+        ``priority`` orders model calls waiting for capacity (lower runs first).
+        ``task`` overrides the task type used for model routing, which is
+        otherwise inferred from the message and session; opening messages
+        without an explicit task that are clearly underspecified are answered
+        locally with clarification questions.
+        Raises ``AdmissionRejected`` when the model call queue is full.
+        """
+        session = await self._begin_turn(session_id, user_message, template_type)
+        
+        if task is None:
+            response = self._preflight(user_message, template_type, session)
+            if response is not None:
+                await self._end_turn(session, response)
+                return response
+        
+        # Always generate AI response - no rule-based templated responses
+        try:
+            if generation_mode == "sections":
+                response = await self._generate_sectioned_response(user_message, template_type, project_context, session, priority, task)
+            else:
+                response = await self._generate_prd_response(user_message, template_type, project_context, session, priority, task)
+        except (AdmissionRejected, asyncio.CancelledError):
+            self._abort_turn(session)
+            raise
+        
+        await self._end_turn(session, response)
+        return response
+    
+    async def chat_stream(self, user_message: str, template_type: str = "lean",
+                          project_context: Optional[Dict[str, Any]] = None,
+                          session_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming chat interface yielding token, section and done events.
+        
+        ``section`` events carry each heading's title and matched template
+        section key; ``section_done`` events name each section whose content
+        is complete. The done response carries the turn's document patch. A
+        stream closed before it finishes, e.g. by a client disconnecting,
+        rolls the turn back.
+        """
+        session = await self._begin_turn(session_id, user_message, template_type)
+        
+        response = self._preflight(user_message, template_type, session)
+        if response is not None:
+            await self._end_turn(session, response)
+            yield {"type": "token", "content": response["content"]}
+            yield {"type": "done", "response": response}
+            return
+        
+        try:
+            run_context = self._build_run_context(template_type, session, user_message)
+            decision = self._route(self._classify_task(user_message, session), template_type, run_context)
+            agent = self.agents.get(template_type, decision.model)
+            user_input = self._build_user_input(
+                template_type, user_message, run_context.history, editing=bool(session.current_prd_data)
+            )
+            cache_key = self._cache_key(agent, run_context, user_input)
+            parser = SectionParser(self.template_loader.get_template_sections(template_type))
+            
+            content = await self.response_cache.aget(cache_key) if self.response_cache else None
+            if content is not None:
+                yield {"type": "token", "content": content}
+                for section_event in parser.feed_events(content):
+                    yield section_event
+            else:
+                async with self.scheduler.slot(session.session_id, PRIORITY_INTERACTIVE) as waited:
+                    self._record_queue_wait(waited, PRIORITY_INTERACTIVE)
+                    started = time.perf_counter()
+                    first_token = True
+                    result = Runner.run_streamed(
+                        agent, user_input, context=run_context, run_config=self.run_config
+                    )
+                    
+                    async for event in result.stream_events():
+                        if event.type != "raw_response_event" or not isinstance(event.data, ResponseTextDeltaEvent):
+                            continue
+                        
+                        if first_token:
+                            first_token = False
+                            ttft = time.perf_counter() - started
+                            MODEL_TTFT_SECONDS.observe(ttft, model=decision.model)
+                            record_timing("ttft", ttft)
+                        delta = event.data.delta
+                        yield {"type": "token", "content": delta}
+                        for section_event in parser.feed_events(delta):
+                            yield section_event
+                    
+                    content = result.final_output
+                    self._record_route(decision, started, result)
+                if self.response_cache:
+                    await self.response_cache.aset(cache_key, content)
+            
+            for section_event in parser.close_events():
+                yield section_event
+            sections = parser.sections
+            
+            response = self._build_prd_response(content, template_type, run_context, decision)
+        except AdmissionRejected as e:
+            self._abort_turn(session)
+            yield {"type": "error", "content": str(e), "retry_after": e.retry_after}
+            return
+        except (GeneratorExit, asyncio.CancelledError):
+            # The client went away before the reply was complete
+            self._abort_turn(session)
+            raise
+        except Exception as e:
+            response = self._build_error_response(e)
+            sections = None
+        
+        await self._end_turn(session, response, sections)
+        yield {"type": "done", "response": response}
+    
+    async def generate_batch(self, briefs: List[Dict[str, Any]],
+                             concurrency: Optional[int] = None,
+                             admission_timeout: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Generate PRDs for many briefs, yielding each result as it finishes.
+        
+        Each brief is a dict with ``message`` and optional ``template_type``,
+        ``project_context`` and ``id``. Briefs run at bulk priority without
+        session state, and share one built agent per template. A brief whose
+        model call is still rejected after ``admission_timeout`` seconds of
+        retrying (``BATCH_ADMISSION_TIMEOUT`` by default) fails with status
+        ``error`` and the rejection's ``retry_after``.
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency or AgentConfig.BATCH_CONCURRENCY))
+        if admission_timeout is None:
+            admission_timeout = AgentConfig.BATCH_ADMISSION_TIMEOUT
+        run_contexts: Dict[str, PRDRunContext] = {}
+        
+        def run_context_for(template_type: str) -> PRDRunContext:
+            if template_type not in run_contexts:
+                run_contexts[template_type] = self._build_run_context(template_type, SessionState("batch"))
+            return run_contexts[template_type]
+        
+        async def run_one(index: int, brief: Dict[str, Any]) -> Dict[str, Any]:
+            template_type = brief.get("template_type") or "lean"
+            item = {"index": index, "id": brief.get("id"), "template_type": template_type}
+            
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    run_context = run_context_for(template_type)
+                    decision = self._route(TASK_FULL_GENERATION, template_type, run_context)
+                    user_input = self._build_user_input(template_type, brief["message"])
+                    content = await retry_rejected(
+                        lambda: self._run_agent(
+                            self.agents.get(template_type, decision.model), run_context,
+                            user_input, None, PRIORITY_BULK, decision
+                        ),
+                        admission_timeout
+                    )
+                    item["status"] = "ok"
+                    item["response"] = self._build_prd_response(content, template_type, run_context, decision)
+                except AdmissionRejected as e:
+                    item["status"] = "error"
+                    item["error"] = str(e)
+                    item["retry_after"] = e.retry_after
+                except Exception as e:
+                    item["status"] = "error"
+                    item["error"] = str(e)
+                item["elapsed_ms"] = (time.perf_counter() - started) * 1000
+            
+            return item
+        
+        tasks = [asyncio.ensure_future(run_one(index, brief)) for index, brief in enumerate(briefs)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def _begin_turn(self, session_id: Optional[str], user_message: str, template_type: str,
+                          session: Optional[SessionState] = None) -> SessionState:
+        """Record the user message and template on the session.
+        
+        ``session`` is the session when the caller has already fetched it.
+        The session stays pinned in memory until ``_end_turn`` or ``_abort_turn``.
+        """
+        session = session or await self.sessions.aget(session_id)
+        self.sessions.pin(session)
+        session.turns += 1
         
         # Add user message to history
-        self.conversation_history.append({
+        self.sessions.add_message(session, {
             "role": "user",
             "content": user_message,
             "timestamp": self._get_timestamp()
@@ -48,78 +303,423 @@ class PRDAgent:
         
         # Set current template if provided
         if template_type:
-            self.current_template = template_type
+            session.current_template = template_type
         
-        # Always generate AI response - no rule-based templated responses
-        response = await self._generate_prd_response(user_message, template_type, project_context)
+        return session
+    
+    async def regenerate_section(self, section_key: str, instructions: str = "",
+                                 template_type: Optional[str] = None,
+                                 project_context: Optional[Dict[str, Any]] = None,
+                                 session_id: Optional[str] = None,
+                                 priority: int = PRIORITY_INTERACTIVE) -> Dict[str, Any]:
+        """Regenerate one section of the session's PRD, leaving the others untouched.
+        
+        Raises ``KeyError`` if the template has no such section and
+        ``AdmissionRejected`` when the model call queue is full.
+        """
+        session = await self.sessions.aget(session_id)
+        template_type = template_type or session.current_template or "lean"
+        sections = self.template_loader.get_template_sections(template_type)
+        if section_key not in sections:
+            raise KeyError(f"Template {template_type} has no section {section_key}")
+        
+        title = sections[section_key].get("title", section_key)
+        user_message = f"Regenerate the {title} section" + (f": {instructions}" if instructions else "")
+        await self._begin_turn(session.session_id, user_message, template_type, session)
+        
+        try:
+            run_context = self._build_run_context(template_type, session, user_message)
+            decision = self._route(TASK_SECTION_EDIT, template_type, run_context)
+            section_input = SystemPrompts.build_section_prompt(
+                template_type, section_key, sections[section_key],
+                instructions or f"Rewrite the {title} section so it is consistent with the rest of the PRD",
+                project_context
+            )
+            content = await self._run_agent(
+                self.agents.get(template_type, decision.model), run_context, section_input,
+                session.session_id, priority, decision
+            )
+            content = self._strip_section_heading(content, section_key, sections)
+            
+            response = self._build_prd_response(content, template_type, run_context, decision)
+            response["type"] = "section_content"
+            response["section_key"] = section_key
+            response["metadata"]["sections_generated"] = [section_key]
+            updated = {section_key: content}
+        except (AdmissionRejected, asyncio.CancelledError):
+            self._abort_turn(session)
+            raise
+        except Exception as e:
+            response = self._build_error_response(e)
+            updated = None
+        
+        await self._end_turn(session, response, updated)
+        return response
+    
+    async def get_sections(self, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Get the PRD sections stored on a session."""
+        return dict((await self.sessions.aget(session_id)).current_prd_data)
+    
+    async def get_document(self, session_id: Optional[str] = None,
+                     version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Get a session's PRD sections as of a version (the latest by default).
+        
+        Returns None if the version does not exist or is no longer retained.
+        """
+        document = (await self.sessions.aget(session_id)).document
+        sections = document.at(version)
+        if sections is None:
+            return None
+        return {
+            "version": document.version if version is None else version,
+            "latest_version": document.version,
+            "oldest_version": document.base_version,
+            "sections": sections,
+        }
+    
+    async def get_patches(self, session_id: Optional[str] = None, since: int = 0) -> Optional[Dict[str, Any]]:
+        """Get the patches after version ``since``, or None if that version is no longer retained."""
+        document = (await self.sessions.aget(session_id)).document
+        patches = document.patches_since(since)
+        if patches is None:
+            return None
+        return {"version": document.version, "patches": patches}
+    
+    async def _end_turn(self, session: SessionState, response: Dict[str, Any],
+                  sections: Optional[Dict[str, str]] = None):
+        """Record the assistant response on the session and store its PRD sections.
         
-        # Add assistant response to history
-        self.conversation_history.append({
+        Sections are parsed from PRD content unless given explicitly, and
+        stored as a new document version; the response gets the resulting
+        ``patch`` (None if nothing changed) and the document ``version``.
+        """
+        if sections is None and response.get("type") == "prd_content":
+            template_type = response.get("template_type") or session.current_template
+            sections = SectionParser(self.template_loader.get_template_sections(template_type)).parse(response["content"])
+        if sections:
+            metadata = response.setdefault("metadata", {})
+            metadata["sections_parsed"] = list(sections)
+            compiled = self.template_loader.get_compiled_template(response.get("template_type") or session.current_template)
+            if compiled is not None and compiled.constrained:
+                metadata["constraint_violations"] = compiled.check(sections)
+            response["patch"] = self.sessions.update_sections(session, sections)
+        response["version"] = session.document.version
+        
+        self.sessions.add_message(session, {
             "role": "assistant",
             "content": response["content"],
             "timestamp": self._get_timestamp(),
             "metadata": response.get("metadata", {})
         })
-        
-        return response
+        try:
+            await self.sessions.save(session)
+        finally:
+            self.sessions.unpin(session)
+    
+    def _abort_turn(self, session: SessionState):
+        """Drop the user message of a turn that never reached the model or was cancelled."""
+        if session.conversation_history and session.conversation_history[-1]["role"] == "user":
+            session.conversation_history.pop()
+        session.turns -= 1
+        self.sessions.unpin(session)
     
-    async def _generate_prd_response(self, user_message: str, template_type: str, project_context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    async def _generate_prd_response(self, user_message: str, template_type: str, project_context: Optional[Dict[str, Any]] = None,
+                                     session: Optional[SessionState] = None,
+                                     priority: int = PRIORITY_INTERACTIVE,
+                                     task: Optional[str] = None) -> Dict[str, Any]:
         """Generate PRD content response using OpenAI Agents SDK."""
+        session = session or await self.sessions.aget()
         try:
-            # Update agent instructions with template-specific context
-            template_context = SystemPrompts.build_system_prompt(
-                template_type=template_type,
-                context={
-                    "current_prd": json.dumps(self.current_prd_data, indent=2),
-                    "template_sections": str(self.template_loader.get_template_sections(template_type))
-                }
-            )
+            run_context = self._build_run_context(template_type, session, user_message)
+            decision = self._route(task or self._classify_task(user_message, session), template_type, run_context)
+            agent = self.agents.get(template_type, decision.model)
             
-            # Create a new agent instance with updated instructions
-            agent_with_context = Agent(
-                name=self.agent.name,
-                instructions=template_context,
-                model=self.agent.model
+            # Run the agent with the user message
+            content = await self._run_agent(
+                agent,
+                run_context,
+                self._build_user_input(
+                    template_type, user_message, run_context.history, editing=bool(session.current_prd_data)
+                ),
+                session.session_id,
+                priority,
+                decision
             )
             
-            # Run the agent with the user message
+            return self._build_prd_response(content, template_type, run_context, decision)
+            
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            return self._build_error_response(e)
+    
+    async def _generate_sectioned_response(self, user_message: str, template_type: str,
+                                           project_context: Optional[Dict[str, Any]] = None,
+                                           session: Optional[SessionState] = None,
+                                           priority: int = PRIORITY_INTERACTIVE,
+                                           task: Optional[str] = None) -> Dict[str, Any]:
+        """Generate each template section in parallel and assemble them in template order.
+        
+        Every section is a fresh write, so calls are routed as full generation
+        unless the caller gives a task. The first ``AdmissionRejected`` cancels
+        the sections still running and is raised; other section failures are
+        reported in ``metadata.failed_sections`` and ``metadata.section_errors``.
+        """
+        session = session or await self.sessions.aget()
+        sections = self.template_loader.get_template_sections(template_type)
+        if not sections:
+            return await self._generate_prd_response(user_message, template_type, project_context, session, priority, task)
+        
+        try:
+            run_context = self._build_run_context(template_type, session, user_message)
+            decision = self._route(task or TASK_FULL_GENERATION, template_type, run_context)
+            agent = self.agents.get(template_type, decision.model)
+        except Exception as e:
+            return self._build_error_response(e)
+        
+        semaphore = asyncio.Semaphore(max(1, AgentConfig.SECTION_CONCURRENCY))
+        section_errors: Dict[str, str] = {}
+        
+        async def generate(section_key: str, section_data: Dict[str, Any]) -> Optional[str]:
+            async with semaphore:
+                try:
+                    return await self._generate_section(
+                        agent, run_context, template_type, section_key, section_data,
+                        user_message, project_context, session.session_id, priority, decision
+                    )
+                except AdmissionRejected:
+                    raise
+                except Exception as e:
+                    section_errors[section_key] = str(e)
+                    return None
+        
+        tasks = [asyncio.ensure_future(generate(key, data)) for key, data in sections.items()]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            # Stop the other sections from spending upstream calls on a turn that is being dropped
+            for pending in tasks:
+                pending.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        
+        parts = []
+        failed_sections = []
+        for (section_key, section_data), content in zip(sections.items(), results):
+            title = section_data.get("title", section_key)
+            if content is None:
+                failed_sections.append(section_key)
+                content = "_This section could not be generated. Please try again._"
+            parts.append(f"## {title}\n\n{content.strip()}")
+        
+        if len(failed_sections) == len(sections):
+            return self._build_error_response(
+                RuntimeError(f"all sections failed to generate ({next(iter(section_errors.values()))})")
+            )
+        
+        response = self._build_prd_response("\n\n".join(parts), template_type, run_context, decision)
+        response["metadata"]["sections_generated"] = [key for key in sections if key not in failed_sections]
+        response["metadata"]["generation_mode"] = "sections"
+        response["metadata"]["failed_sections"] = failed_sections
+        response["metadata"]["section_errors"] = section_errors
+        return response
+    
+    async def _generate_section(self, agent: Agent, run_context: PRDRunContext, template_type: str,
+                                section_key: str, section_data: Dict[str, Any], user_message: str,
+                                project_context: Optional[Dict[str, Any]] = None,
+                                project_key: Optional[str] = None,
+                                priority: int = PRIORITY_INTERACTIVE,
+                                decision: Optional[RouteDecision] = None) -> str:
+        """Generate a single section, retrying failures with backoff.
+        
+        ``AdmissionRejected`` is raised at once; other errors are raised after the last retry.
+        """
+        section_input = SystemPrompts.build_section_prompt(
+            template_type, section_key, section_data, user_message, project_context
+        )
+        
+        for attempt in range(AgentConfig.SECTION_MAX_RETRIES + 1):
+            try:
+                return await self._run_agent(agent, run_context, section_input, project_key, priority, decision)
+            except AdmissionRejected:
+                raise
+            except Exception:
+                if attempt == AgentConfig.SECTION_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(AgentConfig.SECTION_RETRY_DELAY * (2 ** attempt))
+    
+    async def _run_agent(self, agent: Agent, run_context: PRDRunContext, user_input: str,
+                         project_key: Optional[str] = None,
+                         priority: int = PRIORITY_INTERACTIVE,
+                         decision: Optional[RouteDecision] = None) -> str:
+        """Run an agent, serving repeated requests from the response cache.
+        
+        Concurrent identical requests share a single upstream call, which
+        waits for an admission slot before reaching the model.
+        """
+        cache_key = self._cache_key(agent, run_context, user_input)
+        if self.response_cache is not None:
+            cached = await self.response_cache.aget(cache_key)
+            if cached is not None:
+                return cached
+        
+        flight_key = self._cache_key(agent, run_context, " ".join(user_input.split()))
+        return await self.inflight.do(
+            flight_key,
+            lambda: self._run_agent_uncached(agent, run_context, user_input, cache_key, project_key, priority, decision)
+        )
+    
+    async def _run_agent_uncached(self, agent: Agent, run_context: PRDRunContext, user_input: str, cache_key: str,
+                                  project_key: Optional[str] = None,
+                                  priority: int = PRIORITY_INTERACTIVE,
+                                  decision: Optional[RouteDecision] = None) -> str:
+        """Run an agent against the model and store the output in the cache."""
+        async with self.scheduler.slot(project_key, priority) as waited:
+            self._record_queue_wait(waited, priority)
+            started = time.perf_counter()
             result = await Runner.run(
-                agent_with_context,
-                f"Create PRD content using {template_type} template: {user_message}"
+                agent, user_input, context=run_context, run_config=self.run_config
             )
+            if decision is not None:
+                self._record_route(decision, started, result)
+        if self.response_cache is not None:
+            await self.response_cache.aset(cache_key, result.final_output)
+        return result.final_output
+    
+    @staticmethod
+    def _strip_section_heading(content: str, section_key: str, sections: Dict[str, Any]) -> str:
+        """Drop a leading heading for the section itself, which models sometimes add anyway."""
+        content = content.strip()
+        first_line, _, rest = content.partition("\n")
+        if first_line.lstrip().startswith(("#", "**")):
+            if SectionParser(sections).heading_key(first_line) == section_key:
+                return rest.strip()
+        return content
+    
+    def _render_template_prompts(self, template_types: List[str]):
+        """Pre-render the static prompt prefix of templates that were loaded or changed."""
+        for template_type in template_types:
+            self.prompts.static_prefix(template_type, self.template_loader.get_template_sections(template_type))
+    
+    def _preflight(self, user_message: str, template_type: str,
+                   session: SessionState) -> Optional[Dict[str, Any]]:
+        """Answer a clearly underspecified opening message of the request's session locally, or return None."""
+        return self.preflight.check(user_message, template_type, session.turns, session.current_prd_data)
+    
+    def _classify_task(self, user_message: str, session: SessionState) -> str:
+        """Infer the routing task type from the message's completeness and session state."""
+        completeness = self.validator.validate_user_input(user_message)["completeness_score"]
+        return self.router.classify(completeness, has_prd=bool(session.current_prd_data))
+    
+    def _route(self, task: str, template_type: str, run_context: PRDRunContext) -> RouteDecision:
+        """Choose the model for a request from its task, template and prompt size."""
+        prompt_tokens = (run_context.context_usage or {}).get("used_tokens", 0)
+        return self.router.route(task, template_type, prompt_tokens)
+    
+    def _record_route(self, decision: RouteDecision, started: float, result: Any):
+        """Record the latency and token usage of a model call on its route and in the metrics."""
+        elapsed = time.perf_counter() - started
+        usage = result.context_wrapper.usage
+        self.router.record(decision, elapsed, usage.input_tokens, usage.output_tokens)
+        
+        MODEL_SECONDS.observe(elapsed, model=decision.model, route=decision.route)
+        MODEL_TOKENS.inc(usage.input_tokens, model=decision.model, direction="input")
+        MODEL_TOKENS.inc(usage.output_tokens, model=decision.model, direction="output")
+        record_timing("model", elapsed)
+    
+    @staticmethod
+    def _record_queue_wait(waited: float, priority: int):
+        """Record how long a model call waited for an admission slot."""
+        QUEUE_WAIT_SECONDS.observe(waited, priority="bulk" if priority >= PRIORITY_BULK else "interactive")
+        record_timing("queue", waited)
+    
+    def _cache_key(self, agent: Agent, run_context: PRDRunContext, user_input: str) -> str:
+        """Build the response cache key for an agent run."""
+        return ResponseCache.make_key(
+            str(agent.model), agent.model_settings.temperature, run_context.instructions, user_input
+        )
+    
+    def _build_run_context(self, template_type: str, session: SessionState,
+                           user_message: str = "") -> PRDRunContext:
+        """Build the per-request context: instructions and history fitted to the token budget."""
+        with PROMPT_BUILD_SECONDS.time("prompt"):
+            template_sections = self.template_loader.get_template_sections(template_type)
             
-            return {
-                "content": result.final_output,
-                "type": "prd_content",
-                "template_type": template_type,
-                "metadata": {
-                    "sections_generated": list(self.template_loader.get_template_sections(template_type).keys())
-                }
-            }
+            # The current user message was already appended by _begin_turn
+            history = session.conversation_history
+            if history and history[-1]["role"] == "user" and history[-1]["content"] == user_message:
+                history = history[:-1]
             
-        except Exception as e:
-            return {
-                "content": f"I encountered an error while generating the PRD: {str(e)}. Please try again or provide more specific information.",
-                "type": "error"
-            }
+            # Templates with length and list limits reserve what their sections can produce
+            compiled = self.template_loader.get_compiled_template(template_type)
+            plan = self.context_window.plan(
+                self.prompts.static_prefix(template_type, template_sections),
+                session.current_prd_data,
+                history,
+                user_message,
+                compiled.output_tokens if compiled is not None and compiled.constrained else None
+            )
+            instructions = self.prompts.build(template_type, template_sections, plan.prd_sections)
+            return PRDRunContext(instructions, template_type, plan.history_text, plan.usage)
     
-    def get_conversation_history(self) -> List[Dict[str, Any]]:
-        """Get conversation history."""
-        return self.conversation_history.copy()
+    def _build_user_input(self, template_type: str, user_message: str, history: str = "",
+                          editing: bool = False) -> str:
+        """Build the user input sent to the model.
+        
+        When ``editing`` an existing PRD, the model is asked for the changed sections only.
+        """
+        if editing:
+            request = f"Update the {template_type} PRD: {user_message}\n{SystemPrompts.EDIT_INSTRUCTIONS}"
+        else:
+            request = f"Create PRD content using {template_type} template: {user_message}"
+        return f"{history}\n\n{request}" if history else request
+    
+    def _build_prd_response(self, content: str, template_type: str,
+                            run_context: Optional[PRDRunContext] = None,
+                            decision: Optional[RouteDecision] = None) -> Dict[str, Any]:
+        """Wrap generated content in a PRD response."""
+        metadata = {
+            "sections_generated": list(self.template_loader.get_template_sections(template_type).keys())
+        }
+        if run_context is not None and run_context.context_usage is not None:
+            metadata["context_budget"] = run_context.context_usage
+        if decision is not None:
+            metadata["route"] = decision.to_dict()
+        
+        return {
+            "content": content,
+            "type": "prd_content",
+            "template_type": template_type,
+            "metadata": metadata
+        }
     
-    def clear_conversation(self):
-        """Clear conversation history."""
-        self.conversation_history.clear()
-        self.current_prd_data.clear()
+    def _build_error_response(self, error: Exception) -> Dict[str, Any]:
+        """Build the response returned when generation fails."""
+        return {
+            "content": f"I encountered an error while generating the PRD: {str(error)}. Please try again or provide more specific information.",
+            "type": "error"
+        }
     
-    def get_available_templates(self) -> List[str]:
-        """Get available template types."""
-        return self.template_loader.get_available_templates()
+    async def get_conversation_history(self, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get conversation history for a session."""
+        return (await self.sessions.aget(session_id)).conversation_history.copy()
+    
+    async def clear_conversation(self, session_id: Optional[str] = None):
+        """Clear conversation history for a session."""
+        await self.sessions.clear(session_id)
+    
+    def get_available_templates(self, kind: Optional[str] = None) -> List[str]:
+        """Get available template types, optionally only those of one kind."""
+        return self.template_loader.get_available_templates(kind)
     
     def get_template_info(self, template_type: str) -> Dict[str, Any]:
         """Get information about a specific template."""
         return self.template_loader.get_template_info(template_type)
     
+    async def aclose(self):
+        """Close pooled provider connections."""
+        await close_http_clients()
+    
     def _get_timestamp(self) -> str:
         """Get current timestamp."""
         from datetime import datetime
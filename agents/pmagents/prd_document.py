@@ -0,0 +1,156 @@
+"""Versioned, per-section PRD documents."""
+
+import time
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional
+
+OP_ADD = "add"
+OP_REPLACE = "replace"
+OP_REMOVE = "remove"
+
+
+class PRDDocument:
+    """A PRD held as sections, with a patch recorded for every change.
+
+    Each call to ``apply`` that changes anything creates a new version and
+    records only the sections that changed. Replaced sections are stored as
+    line diffs against their previous content, so a retained version costs
+    the size of its edit rather than of the section; ``apply`` and
+    ``patches_since`` hand out patches with the full content. Any retained
+    version can be rebuilt by replaying patches onto the base snapshot; once
+    more than ``max_versions`` patches are kept, the oldest are folded into
+    the base.
+    """
+
+    __slots__ = ("sections", "base_version", "base_sections", "patches", "max_versions")
+
+    def __init__(self, max_versions: int = 20):
+        self.sections: Dict[str, str] = {}
+        self.base_version = 0
+        self.base_sections: Dict[str, str] = {}
+        self.patches: List[Dict[str, Any]] = []
+        self.max_versions = max_versions
+
+    @property
+    def version(self) -> int:
+        return self.base_version + len(self.patches)
+
+    def apply(self, sections: Dict[str, str], removed: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """Merge changed sections into the document.
+
+        Returns the patch for the new version, or None if nothing changed.
+        """
+        ops = []
+        stored_ops = []
+        for key, content in sections.items():
+            previous = self.sections.get(key)
+            if previous == content:
+                continue
+            if previous is None:
+                ops.append({"op": OP_ADD, "key": key, "content": content})
+                stored_ops.append(ops[-1])
+            else:
+                ops.append({"op": OP_REPLACE, "key": key, "content": content})
+                stored_ops.append({"op": OP_REPLACE, "key": key, "diff": self._diff(previous, content)})
+        for key in removed or ():
+            if key in self.sections:
+                ops.append({"op": OP_REMOVE, "key": key})
+                stored_ops.append(ops[-1])
+        if not ops:
+            return None
+
+        self._apply_ops(self.sections, ops)
+        patch = {"base_version": self.version, "version": self.version + 1, "ops": ops, "created_at": time.time()}
+        self.patches.append({**patch, "ops": stored_ops})
+
+        while len(self.patches) > self.max_versions:
+            oldest = self.patches.pop(0)
+            self._apply_ops(self.base_sections, oldest["ops"])
+            self.base_version = oldest["version"]
+        return patch
+
+    def at(self, version: Optional[int] = None) -> Optional[Dict[str, str]]:
+        """Rebuild the sections as of a version, or None if it is no longer retained."""
+        if version is None or version == self.version:
+            return dict(self.sections)
+        if version < self.base_version or version > self.version:
+            return None
+
+        sections = dict(self.base_sections)
+        for patch in self.patches[:version - self.base_version]:
+            self._apply_ops(sections, patch["ops"])
+        return sections
+
+    def patches_since(self, version: int) -> Optional[List[Dict[str, Any]]]:
+        """Get the patches that bring a client at ``version`` up to date, or None if too old."""
+        sections = self.at(version)
+        if sections is None:
+            return None
+
+        patches = []
+        for patch in self.patches[version - self.base_version:]:
+            ops = [
+                {"op": op["op"], "key": op["key"], "content": self._content(sections, op)}
+                if op["op"] == OP_REPLACE else op
+                for op in patch["ops"]
+            ]
+            self._apply_ops(sections, patch["ops"])
+            patches.append({**patch, "ops": ops})
+        return patches
+
+    def clear(self):
+        self.sections = {}
+        self.base_version = 0
+        self.base_sections = {}
+        self.patches = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sections": self.sections,
+            "base_version": self.base_version,
+            "base_sections": self.base_sections,
+            "patches": self.patches,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], max_versions: int = 20) -> "PRDDocument":
+        document = cls(max_versions)
+        document.sections = data.get("sections", {})
+        document.base_version = data.get("base_version", 0)
+        document.base_sections = data.get("base_sections", {})
+        document.patches = data.get("patches", [])
+        while len(document.patches) > max_versions:
+            oldest = document.patches.pop(0)
+            document._apply_ops(document.base_sections, oldest["ops"])
+            document.base_version = oldest["version"]
+        return document
+
+    @staticmethod
+    def _diff(previous: str, content: str) -> List[List[Any]]:
+        """Line edits turning ``previous`` into ``content``, as ``[start, end, new lines]`` spans."""
+        old_lines = previous.splitlines(keepends=True)
+        new_lines = content.splitlines(keepends=True)
+        return [
+            [i1, i2, new_lines[j1:j2]]
+            for tag, i1, i2, j1, j2 in SequenceMatcher(None, old_lines, new_lines, autojunk=False).get_opcodes()
+            if tag != "equal"
+        ]
+
+    @staticmethod
+    def _content(sections: Dict[str, str], op: Dict[str, Any]) -> str:
+        """The content an add or replace op gives its section, given the sections before it."""
+        if "diff" not in op:
+            return op["content"]
+        lines = sections.get(op["key"], "").splitlines(keepends=True)
+        # Later spans first, so earlier line numbers still hold
+        for start, end, new_lines in reversed(op["diff"]):
+            lines[start:end] = new_lines
+        return "".join(lines)
+
+    @classmethod
+    def _apply_ops(cls, sections: Dict[str, str], ops: List[Dict[str, Any]]):
+        for op in ops:
+            if op["op"] == OP_REMOVE:
+                sections.pop(op["key"], None)
+            else:
+                sections[op["key"]] = cls._content(sections, op)
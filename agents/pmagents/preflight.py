@@ -0,0 +1,84 @@
+"""Local pre-flight answers for underspecified requests."""
+
+import time
+from typing import Any, Dict, Mapping, Optional
+
+from tools import PRDValidator
+
+
+class PreflightGate:
+    """Answers clearly underspecified opening messages without calling the model.
+
+    A message is answered locally with clarification questions when it is the
+    first turn of a session with no PRD yet and its validator completeness
+    score is at or below the template's threshold. Everything else, including
+    follow-up answers whose meaning depends on the conversation, goes to the
+    model.
+    """
+
+    def __init__(self, validator: PRDValidator, default_threshold: float = 0.2,
+                 template_thresholds: Optional[Mapping[str, float]] = None, enabled: bool = True):
+        self.validator = validator
+        self.default_threshold = default_threshold
+        self.template_thresholds = dict(template_thresholds or {})
+        self.enabled = enabled
+        self._counters = {"checked": 0, "answered_locally": 0, "escalated": 0, "skipped": 0}
+        self._local_seconds = 0.0
+        self._local_max_seconds = 0.0
+
+    def threshold(self, template_type: str) -> float:
+        """Get the completeness score at or below which a template's requests are answered locally."""
+        return self.template_thresholds.get(template_type, self.default_threshold)
+
+    def check(self, user_message: str, template_type: str,
+              turn: int, current_prd: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return a local clarification response, or None to escalate to the model.
+
+        ``turn`` is the message's 1-based turn number in its session.
+        """
+        if not self.enabled or current_prd or turn > 1:
+            self._counters["skipped"] += 1
+            return None
+
+        started = time.perf_counter()
+        self._counters["checked"] += 1
+        validation = self.validator.validate_user_input(user_message)
+        score = validation["completeness_score"]
+        threshold = self.threshold(template_type)
+        if score > threshold or not validation["missing_info"]:
+            self._counters["escalated"] += 1
+            return None
+
+        questions = self.validator.generate_clarification_questions(validation["missing_info"])
+        content = "To draft a useful PRD I need a few more details:\n\n" + "\n".join(
+            f"{index}. {question}" for index, question in enumerate(questions, 1)
+        )
+        response = {
+            "content": content,
+            "type": "clarification",
+            "requires_input": True,
+            "missing_info": validation["missing_info"],
+            "template_type": template_type,
+            "metadata": {
+                "preflight": {"completeness_score": score, "threshold": threshold},
+            },
+        }
+
+        elapsed = time.perf_counter() - started
+        self._counters["answered_locally"] += 1
+        self._local_seconds += elapsed
+        self._local_max_seconds = max(self._local_max_seconds, elapsed)
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        """Get pre-flight counters; ``llm_calls_saved`` counts local answers."""
+        answered = self._counters["answered_locally"]
+        return {
+            **self._counters,
+            "enabled": self.enabled,
+            "llm_calls_saved": answered,
+            "local_avg_ms": (self._local_seconds / answered * 1000) if answered else 0.0,
+            "local_max_ms": self._local_max_seconds * 1000,
+            "default_threshold": self.default_threshold,
+            "template_thresholds": dict(self.template_thresholds),
+        }
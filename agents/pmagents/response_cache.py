@@ -0,0 +1,247 @@
+"""Content-addressed cache for LLM responses."""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from .storage import Database
+
+
+class ResponseCache:
+    """Two-tier LRU cache of model outputs keyed on a hash of the request.
+
+    The memory tier is bounded by entry count and total bytes. The optional
+    SQLite tier is bounded by total bytes, checked every
+    ``db_prune_interval`` inserts, and survives restarts. Both tiers
+    expire entries after ``ttl_seconds`` (0 disables expiry). Worker
+    processes pointed at the same file share the SQLite tier; entries are
+    content-addressed, so each worker's own memory tier stays valid.
+    ``aget`` and ``aset`` run the SQLite tier on a worker thread, for
+    callers on the event loop.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 64 * 1024 * 1024,
+                 ttl_seconds: int = 86400, db_path: Optional[str] = None,
+                 db_max_bytes: int = 512 * 1024 * 1024, db_prune_interval: int = 32):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.db_max_bytes = db_max_bytes
+        self.db_prune_interval = max(1, db_prune_interval)
+        # Disk inserts by this process, counted under the database's write lock
+        self._db_inserts = 0
+        # key -> (value, expires_at, size)
+        self._entries: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._db: Optional[Database] = None
+        self._counters = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+        if db_path:
+            self._db = Database(db_path)
+            self._db.write(self._create_schema)
+
+    @staticmethod
+    def make_key(model: str, temperature: float, system_prompt: str, user_message: str) -> str:
+        """Build the content address for a model request."""
+        payload = json.dumps([model, temperature, system_prompt, user_message], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _create_schema(db: sqlite3.Connection):
+        """Create the disk tier's table."""
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, "
+            "size INTEGER NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached response, or None on a miss."""
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is None:
+            value = self._disk_get(key, now)
+        return value
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Get a cached response, looking in the disk tier on a worker thread."""
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is None:
+            if self._db is None:
+                return self._disk_get(key, now)
+            value = await asyncio.to_thread(self._disk_get, key, now)
+        return value
+
+    def set(self, key: str, value: str):
+        """Store a response in every tier."""
+        if not isinstance(value, str):
+            return
+
+        expires_at = self._store(key, value)
+        self._disk_set(key, value, expires_at)
+
+    async def aset(self, key: str, value: str):
+        """Store a response in every tier, writing the disk tier on a worker thread."""
+        if not isinstance(value, str):
+            return
+
+        expires_at = self._store(key, value)
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_set, key, value, expires_at)
+
+    def clear(self):
+        """Drop every cached response."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self._db is not None:
+            self._db.write(lambda db: db.execute("DELETE FROM responses"))
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and tier sizes."""
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            stats = {
+                **self._counters,
+                "hit_rate": self._counters["hits"] / lookups if lookups else 0.0,
+                "memory_entries": len(self._entries),
+                "memory_bytes": self._bytes,
+                "disk_enabled": self._db is not None,
+                "disk_entries": 0,
+                "disk_bytes": 0,
+            }
+            if self._db is not None:
+                count, size = self._db.read("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses")[0]
+                stats["disk_entries"] = count
+                stats["disk_bytes"] = size
+            return stats
+
+    def _store(self, key: str, value: str) -> float:
+        """Insert into the memory tier and count the store; returns the expiry time."""
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds > 0 else 0.0
+        with self._lock:
+            self._memory_set(key, value, expires_at)
+            self._counters["stores"] += 1
+        return expires_at
+
+    def _memory_get(self, key: str, now: float) -> Optional[str]:
+        """Look a key up in the memory tier."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at, _ = entry
+            if expires_at and expires_at <= now:
+                self._remove(key)
+                self._counters["expirations"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            self._counters["memory_hits"] += 1
+            return value
+
+    def _memory_set(self, key: str, value: str, expires_at: float):
+        """Insert into the memory tier and evict down to its bounds."""
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        self._remove(key)
+        self._entries[key] = (value, expires_at, size)
+        self._bytes += size
+
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._counters["evictions"] += 1
+
+    def _remove(self, key: str):
+        """Remove a key from the memory tier."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def _disk_get(self, key: str, now: float) -> Optional[str]:
+        """Look a memory miss up in the disk tier, promoting hits to memory."""
+        value = None
+        expired = False
+        if self._db is not None:
+            rows = self._db.read("SELECT value, expires_at FROM responses WHERE key = ?", (key,))
+            if rows:
+                value, expires_at = rows[0]
+                if expires_at and expires_at <= now:
+                    self._db.write(lambda db: db.execute("DELETE FROM responses WHERE key = ?", (key,)))
+                    value = None
+                    expired = True
+                else:
+                    self._db.write(lambda db: db.execute(
+                        "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+                    ))
+
+        with self._lock:
+            if expired:
+                self._counters["expirations"] += 1
+            if value is None:
+                self._counters["misses"] += 1
+                return None
+            self._memory_set(key, value, expires_at)
+            self._counters["hits"] += 1
+            self._counters["disk_hits"] += 1
+            return value
+
+    def _disk_set(self, key: str, value: str, expires_at: float):
+        """Insert into the disk tier and evict least recently used rows over budget.
+
+        Summing the sizes scans the table, so the budget is only checked
+        every ``db_prune_interval`` inserts and can be overshot in between.
+        """
+        if self._db is None:
+            return
+
+        size = len(value.encode("utf-8"))
+
+        def insert(db: sqlite3.Connection) -> int:
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, size, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, expires_at, size, time.time())
+            )
+
+            self._db_inserts += 1
+            if self._db_inserts % self.db_prune_interval:
+                return 0
+
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= self.db_max_bytes:
+                return 0
+            overflow = total - self.db_max_bytes
+            doomed = []
+            for row_key, row_size in db.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+                if overflow <= 0:
+                    break
+                doomed.append((row_key,))
+                overflow -= row_size
+            db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+            return len(doomed)
+
+        evicted = self._db.write(insert)
+        with self._lock:
+            self._counters["evictions"] += evicted
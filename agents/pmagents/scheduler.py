@@ -0,0 +1,224 @@
+"""Admission control for upstream LLM calls."""
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+T = TypeVar("T")
+
+
+class AdmissionRejected(Exception):
+    """Raised when a call cannot be admitted because the wait queue is full or timed out."""
+
+    def __init__(self, message: str, retry_after: int, status_code: int = 429):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+
+async def retry_rejected(call: Callable[[], Awaitable[T]], max_wait: float) -> T:
+    """Await ``call()``, sleeping out ``AdmissionRejected`` for up to ``max_wait`` seconds in total.
+
+    The last rejection is re-raised once its ``retry_after`` would pass the deadline.
+    """
+    deadline = time.monotonic() + max_wait
+    while True:
+        try:
+            return await call()
+        except AdmissionRejected as e:
+            if time.monotonic() + e.retry_after > deadline:
+                raise
+            await asyncio.sleep(e.retry_after)
+
+
+class _Waiter:
+    """A queued request waiting for a slot."""
+
+    __slots__ = ("future", "project_key", "enqueued_at")
+
+    def __init__(self, future: asyncio.Future, project_key: Optional[str]):
+        self.future = future
+        self.project_key = project_key
+        self.enqueued_at = time.perf_counter()
+
+
+class LLMScheduler:
+    """Bounds concurrent model calls globally and per project.
+
+    Calls beyond the limits wait in a bounded priority queue; lower priority
+    values are admitted first, FIFO within a priority. A call is rejected
+    immediately when the queue is full, and after ``queue_timeout`` seconds
+    of waiting.
+    """
+
+    def __init__(self, max_in_flight: int = 16, max_in_flight_per_project: int = 4,
+                 max_queue: int = 64, queue_timeout: float = 30.0):
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_per_project = max_in_flight_per_project
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._in_flight = 0
+        self._per_project: Dict[str, int] = {}
+        # Only live waiters are kept in the queue, so its length is the pending count
+        self._queue: List[Any] = []
+        self._sequence = itertools.count()
+        self._queue_times: List[float] = []
+        # Waits of calls that were queued, leaving out those admitted at once
+        self._queued_waits: List[float] = []
+        self._counters = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0}
+
+    @asynccontextmanager
+    async def slot(self, project_key: Optional[str] = None,
+                   priority: int = PRIORITY_INTERACTIVE) -> AsyncIterator[float]:
+        """Hold an in-flight slot for the duration of the block.
+
+        Yields the time in seconds spent waiting in the queue.
+        """
+        waited = await self.acquire(project_key, priority)
+        try:
+            yield waited
+        finally:
+            self.release(project_key)
+
+    async def acquire(self, project_key: Optional[str] = None,
+                      priority: int = PRIORITY_INTERACTIVE) -> float:
+        """Wait for an in-flight slot and return the queue wait in seconds."""
+        if not self._pending() and self._has_capacity(project_key):
+            self._admit(project_key)
+            self._record_wait(0.0)
+            return 0.0
+
+        if self._pending() >= self.max_queue:
+            self._counters["rejected"] += 1
+            raise AdmissionRejected(
+                "LLM request queue is full", retry_after=self._retry_after(), status_code=429
+            )
+
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), project_key)
+        heapq.heappush(self._queue, (priority, next(self._sequence), waiter))
+        self._counters["queued"] += 1
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            self._counters["timed_out"] += 1
+            self._record_wait(self.queue_timeout, queued=True)
+            raise AdmissionRejected(
+                "Timed out waiting for LLM capacity", retry_after=self._retry_after(), status_code=503
+            )
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+        waited = time.perf_counter() - waiter.enqueued_at
+        self._record_wait(waited, queued=True)
+        return waited
+
+    def release(self, project_key: Optional[str] = None):
+        """Free a slot and admit as many queued waiters as now fit."""
+        self._in_flight -= 1
+        if project_key is not None:
+            remaining = self._per_project.get(project_key, 1) - 1
+            if remaining > 0:
+                self._per_project[project_key] = remaining
+            else:
+                self._per_project.pop(project_key, None)
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get in-flight, queue and wait-time statistics."""
+        waits = sorted(self._queue_times)
+        return {
+            **self._counters,
+            "in_flight": self._in_flight,
+            "queued_now": self._pending(),
+            "max_in_flight": self.max_in_flight,
+            "max_in_flight_per_project": self.max_in_flight_per_project,
+            "max_queue": self.max_queue,
+            "queue_wait_p50_ms": self._percentile(waits, 0.50) * 1000,
+            "queue_wait_p95_ms": self._percentile(waits, 0.95) * 1000,
+            "queue_wait_max_ms": (waits[-1] if waits else 0.0) * 1000,
+        }
+
+    def _has_capacity(self, project_key: Optional[str]) -> bool:
+        if self._in_flight >= self.max_in_flight:
+            return False
+        if project_key is not None and self.max_in_flight_per_project > 0:
+            return self._per_project.get(project_key, 0) < self.max_in_flight_per_project
+        return True
+
+    def _admit(self, project_key: Optional[str]):
+        self._in_flight += 1
+        if project_key is not None:
+            self._per_project[project_key] = self._per_project.get(project_key, 0) + 1
+        self._counters["admitted"] += 1
+
+    def _dispatch(self):
+        """Admit queued waiters in priority order, skipping projects at their limit."""
+        skipped = []
+        while self._queue and self._in_flight < self.max_in_flight:
+            entry = heapq.heappop(self._queue)
+            waiter = entry[2]
+            if not self._has_capacity(waiter.project_key):
+                skipped.append(entry)
+                continue
+            self._admit(waiter.project_key)
+            waiter.future.set_result(None)
+
+        for entry in skipped:
+            heapq.heappush(self._queue, entry)
+
+    def _abandon(self, waiter: _Waiter):
+        """Handle a waiter that gave up, returning its slot if it was just admitted.
+
+        A waiter still queued is taken out of the queue, so it is neither
+        counted as pending nor popped again by ``_dispatch``.
+        """
+        if waiter.future.done():
+            self.release(waiter.project_key)
+            return
+
+        waiter.future.cancel()
+        for index, entry in enumerate(self._queue):
+            if entry[2] is waiter:
+                self._queue[index] = self._queue[-1]
+                self._queue.pop()
+                heapq.heapify(self._queue)
+                break
+
+    def _pending(self) -> int:
+        return len(self._queue)
+
+    def _retry_after(self) -> int:
+        """Estimate seconds until capacity frees up, from the waits of recently queued calls.
+
+        Calls admitted without queueing are left out, so a burst arriving
+        after a quiet spell is not told to retry almost at once.
+        """
+        recent = self._queued_waits
+        estimate = sum(recent) / len(recent) if recent else 1.0
+        return max(1, int(estimate + 0.999))
+
+    def _record_wait(self, waited: float, queued: bool = False):
+        self._queue_times.append(waited)
+        if len(self._queue_times) > 1000:
+            del self._queue_times[:-1000]
+        if queued:
+            self._queued_waits.append(waited)
+            if len(self._queued_waits) > 50:
+                del self._queued_waits[:-50]
+
+    @staticmethod
+    def _percentile(values: List[float], fraction: float) -> float:
+        if not values:
+            return 0.0
+        index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+        return values[index]
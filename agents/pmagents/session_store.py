@@ -0,0 +1,386 @@
+"""Per-session state storage for PRD conversations."""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, Any, List, Optional, Tuple
+
+from .prd_document import PRDDocument
+from .storage import Database, ensure_column
+
+DEFAULT_SESSION_ID = "default"
+
+
+class SessionState:
+    """Conversation state for a single PRD session."""
+
+    __slots__ = (
+        "session_id",
+        "conversation_history",
+        "current_template",
+        "document",
+        "created_at",
+        "last_accessed",
+        "version",
+        "turns",
+    )
+
+    def __init__(self, session_id: str, max_versions: int = 20):
+        self.session_id = session_id
+        self.conversation_history: List[Dict[str, Any]] = []
+        self.current_template: Optional[str] = None
+        self.document = PRDDocument(max_versions)
+        self.created_at = time.time()
+        self.last_accessed = self.created_at
+        # Version of the stored row this state was loaded from or last saved as, 0 if never stored
+        self.version = 0
+        # Turns started on the session, which the capped history cannot tell
+        self.turns = 0
+
+    @property
+    def current_prd_data(self) -> Dict[str, Any]:
+        """The latest version of the session's PRD sections."""
+        return self.document.sections
+
+    def add_message(self, message: Dict[str, Any], max_history: int = 0):
+        """Append a message, dropping the oldest ones beyond max_history."""
+        self.conversation_history.append(message)
+        if max_history > 0 and len(self.conversation_history) > max_history:
+            del self.conversation_history[:-max_history]
+
+    def clear(self):
+        """Reset conversation and PRD state."""
+        self.conversation_history.clear()
+        self.document.clear()
+        self.turns = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize session state."""
+        return {
+            "session_id": self.session_id,
+            "conversation_history": self.conversation_history,
+            "current_template": self.current_template,
+            "document": self.document.to_dict(),
+            "created_at": self.created_at,
+            "last_accessed": self.last_accessed,
+            "turns": self.turns,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], max_versions: int = 20) -> "SessionState":
+        """Deserialize session state, keeping at most ``max_versions`` document versions."""
+        session = cls(data["session_id"], max_versions)
+        session.conversation_history = data.get("conversation_history", [])
+        session.current_template = data.get("current_template")
+        if "document" in data:
+            session.document = PRDDocument.from_dict(data["document"], max_versions)
+        elif data.get("current_prd_data"):
+            session.document.apply(data["current_prd_data"])
+        session.created_at = data.get("created_at", session.created_at)
+        session.last_accessed = data.get("last_accessed", session.last_accessed)
+        session.turns = data.get(
+            "turns", sum(1 for message in session.conversation_history if message["role"] == "user")
+        )
+        return session
+
+
+class SessionManager:
+    """Keeps hot sessions in memory and spills idle ones to SQLite.
+
+    Sessions are held in an LRU-ordered dict capped at ``max_sessions``.
+    Sessions idle for longer than ``ttl_seconds`` or pushed out by the LRU
+    cap are written to the SQLite file (if configured) and reloaded on the
+    next access. Sessions pinned by a turn in progress are never evicted,
+    so the turn's reply is not written to a copy that is no longer held.
+    ``aget`` does its reloads and spills on a worker thread, for callers on
+    the event loop; a session requested while its spill is still being
+    written is taken back from memory.
+
+    With ``shared`` set, several worker processes use the same file: every
+    ``save`` writes the session through, on a worker thread, and bumps its
+    row version, and ``get`` reloads a cached session whose row another
+    worker has written since. Concurrent turns on one session in different
+    workers are last writer wins.
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: int = 1800,
+                 db_path: Optional[str] = None, max_history: int = 0, shared: bool = False,
+                 max_versions: int = 20):
+        if shared and not db_path:
+            raise ValueError("Shared sessions need a database path")
+
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_history = max_history
+        self.max_versions = max_versions
+        self.shared = shared
+        self._sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+        # Number of turns in progress on each session
+        self._pins: Dict[str, int] = {}
+        # Evicted sessions whose spill is still being written
+        self._spilling: Dict[str, SessionState] = {}
+        self._lock = threading.RLock()
+        self._db: Optional[Database] = None
+
+        if db_path:
+            self._db = Database(db_path)
+            self._db.write(self._create_schema)
+
+    @staticmethod
+    def _create_schema(db: sqlite3.Connection):
+        """Create the spill table, or upgrade one from an older version."""
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL, "
+            "version INTEGER NOT NULL DEFAULT 0)"
+        )
+        ensure_column(db, "sessions", "version", "INTEGER NOT NULL DEFAULT 0")
+
+    def get(self, session_id: Optional[str] = None) -> SessionState:
+        """Get a session, loading it from disk or creating it as needed.
+
+        SQLite is read and written on the calling thread; code on the event
+        loop uses ``aget``.
+        """
+        session_id = session_id or DEFAULT_SESSION_ID
+
+        with self._lock:
+            spills = self._evict_expired()
+            session = self._cached(session_id)
+            if session is not None and self.shared and self._stored_version(session_id) != session.version:
+                # Another worker saved or cleared the session since this copy was loaded
+                session = None
+            if session is None:
+                session = self._load(session_id) or SessionState(session_id, self.max_versions)
+            self._use(session, spills)
+
+        self._write_spills(spills)
+        return session
+
+    async def aget(self, session_id: Optional[str] = None) -> SessionState:
+        """Get a session like ``get``, with every SQLite read and spill run on a worker thread."""
+        session_id = session_id or DEFAULT_SESSION_ID
+
+        with self._lock:
+            spills = self._evict_expired()
+            cached = session = self._cached(session_id)
+
+        if session is not None and self.shared:
+            stored = await asyncio.to_thread(self._stored_version, session_id)
+            if stored != session.version:
+                # Another worker saved or cleared the session since this copy was loaded
+                session = None
+
+        loaded = None
+        if session is None and self._db is not None:
+            loaded = await asyncio.to_thread(self._load, session_id)
+
+        with self._lock:
+            current = self._cached(session_id)
+            if current is not None and current is not cached:
+                # Another request loaded or replaced the session while this one read the file
+                session = current
+            elif session is None:
+                session = loaded or SessionState(session_id, self.max_versions)
+            self._use(session, spills)
+
+        if spills:
+            await asyncio.to_thread(self._write_spills, spills)
+        return session
+
+    def add_message(self, session: SessionState, message: Dict[str, Any]):
+        """Append a message to a session, respecting the history cap."""
+        session.add_message(message, self.max_history)
+        session.last_accessed = time.time()
+
+    def update_sections(self, session: SessionState, sections: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Store generated PRD sections on a session as a new document version.
+
+        Returns the version's patch, or None if no section changed.
+        """
+        session.last_accessed = time.time()
+        return session.document.apply(sections)
+
+    def pin(self, session: SessionState):
+        """Keep a session in memory until a matching ``unpin``, for the duration of a turn."""
+        with self._lock:
+            self._pins[session.session_id] = self._pins.get(session.session_id, 0) + 1
+
+    def unpin(self, session: SessionState):
+        """Release a ``pin``; the session can be evicted again once no turn holds it."""
+        with self._lock:
+            count = self._pins.get(session.session_id, 0) - 1
+            if count > 0:
+                self._pins[session.session_id] = count
+            else:
+                self._pins.pop(session.session_id, None)
+
+    async def save(self, session: SessionState):
+        """Write a session through to the shared database at the end of a turn.
+
+        Without ``shared`` sessions stay in memory until they are spilled.
+        """
+        if self.shared:
+            data = json.dumps(session.to_dict())
+            session.version = await asyncio.to_thread(
+                self._write, session.session_id, data, session.last_accessed
+            )
+
+    async def clear(self, session_id: Optional[str] = None):
+        """Clear a session's conversation and PRD state."""
+        session_id = session_id or DEFAULT_SESSION_ID
+
+        if self._db is not None:
+            # Delete the row first, so a get in the meantime cannot reload it
+            await asyncio.to_thread(self._delete, session_id)
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            self._spilling.pop(session_id, None)
+            if session is not None:
+                session.clear()
+
+    def flush(self):
+        """Write every in-memory session to disk.
+
+        Shared sessions are already written through, and writing a stale
+        copy would overwrite another worker's newer one, so this is a no-op.
+        """
+        if self.shared:
+            return
+
+        with self._lock:
+            spills = [(session, self._snapshot(session)) for session in self._sessions.values()
+                      if self._spillable(session)]
+        self._write_spills(spills)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get session store statistics."""
+        with self._lock:
+            stats = {
+                "in_memory": len(self._sessions),
+                "max_in_memory": self.max_sessions,
+                "ttl_seconds": self.ttl_seconds,
+                "pinned": len(self._pins),
+                "persisted": 0,
+            }
+            if self._db is not None:
+                stats["persisted"] = self._db.read("SELECT COUNT(*) FROM sessions")[0][0]
+            return stats
+
+    def _cached(self, session_id: str) -> Optional[SessionState]:
+        """The in-memory copy of a session, taking back one whose spill is still being written."""
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._spilling.get(session_id)
+            if session is not None:
+                self._sessions[session_id] = session
+        return session
+
+    def _use(self, session: SessionState, spills: List[Tuple[SessionState, str]]):
+        """Hold ``session`` as the most recently used copy of its id, evicting any overflow into ``spills``."""
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        spills.extend(self._evict_overflow())
+        session.last_accessed = time.time()
+
+    def _evict_expired(self) -> List[Tuple[SessionState, str]]:
+        """Evict sessions that have been idle longer than the TTL, returning those to spill."""
+        if self.ttl_seconds <= 0:
+            return []
+
+        cutoff = time.time() - self.ttl_seconds
+        expired = []
+        # LRU order means the oldest sessions are at the front
+        for session_id, session in self._sessions.items():
+            if session.last_accessed >= cutoff:
+                break
+            if session_id not in self._pins:
+                expired.append(session_id)
+        return [spill for session_id in expired for spill in self._evict(session_id)]
+
+    def _evict_overflow(self) -> List[Tuple[SessionState, str]]:
+        """Evict least recently used sessions beyond the in-memory cap, returning those to spill.
+
+        Pinned sessions and the most recently used one are skipped, so the
+        cap can be exceeded while every session over it has a turn in progress.
+        """
+        overflow = len(self._sessions) - self.max_sessions
+        if overflow <= 0:
+            return []
+        candidates = islice(self._sessions, len(self._sessions) - 1)
+        unpinned = (session_id for session_id in candidates if session_id not in self._pins)
+        return [spill for session_id in list(islice(unpinned, overflow)) for spill in self._evict(session_id)]
+
+    def _evict(self, session_id: str) -> List[Tuple[SessionState, str]]:
+        """Drop a session from memory, keeping it aside until its spill is written if it needs one.
+
+        The session is serialized here, under the lock, rather than on the
+        thread that writes it.
+        """
+        session = self._sessions.pop(session_id)
+        if not self._spillable(session):
+            return []
+        self._spilling[session_id] = session
+        return [(session, self._snapshot(session))]
+
+    def _spillable(self, session: SessionState) -> bool:
+        """Whether a session is written to the SQLite file when it leaves memory."""
+        if self._db is None or self.shared:
+            return False
+        return bool(session.conversation_history or session.current_prd_data)
+
+    @staticmethod
+    def _snapshot(session: SessionState) -> str:
+        """Serialize a session for its row."""
+        return json.dumps(session.to_dict())
+
+    def _write_spills(self, spills: List[Tuple[SessionState, str]]):
+        """Persist evicted sessions to the SQLite file.
+
+        Only unshared files are spilled to, and no other process writes
+        those, so this does not wait on a lock.
+        """
+        for session, data in spills:
+            try:
+                session.version = self._write(session.session_id, data, session.last_accessed)
+            finally:
+                with self._lock:
+                    if self._spilling.get(session.session_id) is session:
+                        del self._spilling[session.session_id]
+
+    def _write(self, session_id: str, data: str, updated_at: float) -> int:
+        """Upsert a session's row and return the row version it now has."""
+        return self._db.write(lambda db: db.execute(
+            "INSERT INTO sessions (session_id, data, updated_at, version) VALUES (?, ?, ?, 1) "
+            "ON CONFLICT (session_id) DO UPDATE SET "
+            "data = excluded.data, updated_at = excluded.updated_at, version = sessions.version + 1 "
+            "RETURNING version",
+            (session_id, data, updated_at)
+        ).fetchone()[0])
+
+    def _stored_version(self, session_id: str) -> int:
+        """The version of a session's row, 0 if it has none."""
+        rows = self._db.read("SELECT version FROM sessions WHERE session_id = ?", (session_id,))
+        return rows[0][0] if rows else 0
+
+    def _load(self, session_id: str) -> Optional[SessionState]:
+        """Load a spilled session from the SQLite file."""
+        if self._db is None:
+            return None
+
+        rows = self._db.read("SELECT data, version FROM sessions WHERE session_id = ?", (session_id,))
+        if not rows:
+            return None
+
+        data, version = rows[0]
+        session = SessionState.from_dict(json.loads(data), self.max_versions)
+        session.version = version
+        return session
+
+    def _delete(self, session_id: str):
+        """Remove a session from the SQLite file."""
+        self._db.write(lambda db: db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)))
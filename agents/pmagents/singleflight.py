@@ -0,0 +1,61 @@
+"""In-flight request coalescing for duplicate model calls."""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class _Flight:
+    """A shared upstream call and the number of callers waiting on it."""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Shares one in-flight call between concurrent callers with the same key.
+
+    The first caller for a key starts the call; later callers with the same
+    key await the same task and receive its result or exception. A caller
+    that is cancelled only stops waiting; the shared call is cancelled once
+    every waiter has gone.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._counters = {"leaders": 0, "coalesced": 0, "cancelled": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``fn`` for ``key``, or join the call already in flight."""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._finish(key, flight))
+            self._counters["leaders"] += 1
+        else:
+            self._counters["coalesced"] += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done() and flight.waiters == 1:
+                flight.task.cancel()
+                self._counters["cancelled"] += 1
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Get coalescing counters."""
+        return {**self._counters, "in_flight": len(self._flights)}
+
+    def _finish(self, key: str, flight: _Flight):
+        """Forget a completed flight and consume its exception if nobody is left to."""
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            flight.task.exception()
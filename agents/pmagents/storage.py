@@ -0,0 +1,75 @@
+"""SQLite connections shared by the session, cache and job stores."""
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Callable, List, TypeVar
+
+T = TypeVar("T")
+
+BUSY_TIMEOUT_SECONDS = 30.0
+
+
+def open_database(db_path: str, busy_timeout: float = BUSY_TIMEOUT_SECONDS) -> sqlite3.Connection:
+    """Open a SQLite file that several worker processes may use at once.
+
+    Files are put in WAL mode, so readers in one process do not block a
+    writer in another, and writers wait up to ``busy_timeout`` seconds for
+    the write lock instead of failing.
+    """
+    if db_path == ":memory:":
+        return sqlite3.connect(db_path, check_same_thread=False)
+
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(db_path, timeout=busy_timeout, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+class Database:
+    """A SQLite database read on the event loop and written from worker threads.
+
+    File databases get two connections. Reads use one that, in WAL mode,
+    does not wait for another process's write lock; writes use the other,
+    which can wait up to the busy timeout, so async callers run them with
+    ``asyncio.to_thread``. In-memory databases are private to the process
+    and share one connection.
+    """
+
+    def __init__(self, db_path: str, busy_timeout: float = BUSY_TIMEOUT_SECONDS):
+        self._writer = open_database(db_path, busy_timeout)
+        self._write_lock = threading.RLock()
+        if db_path == ":memory:":
+            self._reader, self._read_lock = self._writer, self._write_lock
+        else:
+            self._reader, self._read_lock = open_database(db_path, busy_timeout), threading.RLock()
+
+    def read(self, sql: str, params: Any = ()) -> List[tuple]:
+        """Run a query and return its rows."""
+        with self._read_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def write(self, change: Callable[[sqlite3.Connection], T]) -> T:
+        """Run ``change`` on the write connection and commit it, rolling back if it raises."""
+        with self._write_lock:
+            try:
+                result = change(self._writer)
+            except BaseException:
+                self._writer.rollback()
+                raise
+            self._writer.commit()
+            return result
+
+
+def ensure_column(db: sqlite3.Connection, table: str, column: str, definition: str):
+    """Add a column to a table created by an older version, if it is missing."""
+    columns = {row[1] for row in db.execute(f"PRAGMA table_info({table})")}
+    if column in columns:
+        return
+    try:
+        db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    except sqlite3.OperationalError:
+        # Another worker starting at the same time added it first
+        if column not in {row[1] for row in db.execute(f"PRAGMA table_info({table})")}:
+            raise
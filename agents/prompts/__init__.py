@@ -1,5 +1,6 @@
 """Prompts module for AI agents."""
 
 from .system_prompts import SystemPrompts
+from .prompt_builder import PromptAssembler
 
-__all__ = ["SystemPrompts"]
+__all__ = ["SystemPrompts", "PromptAssembler"]
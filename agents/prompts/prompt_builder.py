@@ -0,0 +1,101 @@
+"""Memoized system prompt assembly."""
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+from .system_prompts import SystemPrompts
+
+
+class PromptAssembler:
+    """Assembles system prompts from a cached static prefix and a rendered PRD suffix.
+
+    The prefix (base prompt, template prompt and template structure) is built
+    once per template and is byte-identical across requests, so provider-side
+    prompt caching can match it. The current PRD is appended after the prefix,
+    and each section's rendering is cached so only changed sections are
+    re-rendered.
+    """
+
+    def __init__(self, max_rendered_sections: int = 4096):
+        self.max_rendered_sections = max_rendered_sections
+        self._prefixes: Dict[Tuple[str, str], Tuple[Dict[str, Any], str]] = {}
+        self._sections: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "prefix_hits": 0,
+            "prefix_misses": 0,
+            "section_hits": 0,
+            "section_misses": 0,
+        }
+
+    def build(self, template_type: str, template_sections: Dict[str, Any],
+              current_prd: Dict[str, Any] = None) -> str:
+        """Build the complete system prompt for a template and PRD state."""
+        prefix = self.static_prefix(template_type, template_sections)
+        if not current_prd:
+            return prefix
+
+        return f"{prefix}\n\nCurrent PRD Content:\n{self.render_prd(current_prd)}"
+
+    def static_prefix(self, template_type: str, template_sections: Dict[str, Any]) -> str:
+        """Get the cached, request-independent part of a template's prompt."""
+        # Template loaders return the same sections object until the template changes,
+        # so identity is a cheap fingerprint; the entry keeps it alive to pin its id
+        key = (template_type, SystemPrompts.PROMPT_VERSION)
+        with self._lock:
+            cached = self._prefixes.get(key)
+            if cached is not None and cached[0] is template_sections:
+                self._counters["prefix_hits"] += 1
+                return cached[1]
+            self._counters["prefix_misses"] += 1
+
+        prompt_parts = [SystemPrompts.BASE_SYSTEM_PROMPT]
+        if template_type in SystemPrompts.TEMPLATE_SPECIFIC_PROMPTS:
+            prompt_parts.append(SystemPrompts.TEMPLATE_SPECIFIC_PROMPTS[template_type])
+        if template_sections:
+            prompt_parts.append(
+                f"\nTemplate Structure:\n{SystemPrompts._format_template_sections(template_sections)}"
+            )
+
+        prefix = "\n\n".join(prompt_parts)
+        with self._lock:
+            self._prefixes[key] = (template_sections, prefix)
+        return prefix
+
+    def render_prd(self, current_prd: Dict[str, Any]) -> str:
+        """Render PRD sections in order, reusing cached renderings of unchanged sections."""
+        return "\n\n".join(
+            self._render_section(section_key, content)
+            for section_key, content in current_prd.items()
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters."""
+        return {
+            **self._counters,
+            "cached_prefixes": len(self._prefixes),
+            "cached_sections": len(self._sections),
+        }
+
+    def _render_section(self, section_key: str, content: Any) -> str:
+        """Render a single PRD section, memoized on its key and content."""
+        if not isinstance(content, str):
+            content = json.dumps(content, sort_keys=True, ensure_ascii=False, indent=2)
+
+        # str caches its own hash, so unchanged sections are O(1) lookups
+        key = (section_key, content)
+        with self._lock:
+            rendered = self._sections.get(key)
+            if rendered is not None:
+                self._sections.move_to_end(key)
+                self._counters["section_hits"] += 1
+                return rendered
+
+            self._counters["section_misses"] += 1
+            rendered = f"### {section_key}\n{content.strip()}"
+            self._sections[key] = rendered
+            while len(self._sections) > self.max_rendered_sections:
+                self._sections.popitem(last=False)
+            return rendered
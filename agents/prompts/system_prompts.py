@@ -2,9 +2,14 @@
 
 from typing import Dict, Any, List
 
+from tools.template_model import FieldSpec
+
 class SystemPrompts:
     """System prompts for PRD creation agents."""
     
+    # Bump when prompt text changes so cached agents and responses are rebuilt
+    PROMPT_VERSION = "1"
+    
     BASE_SYSTEM_PROMPT = """
 You are an expert Product Manager with 10+ years of experience creating successful products. 
 Your role is to help create comprehensive, actionable Product Requirements Documents (PRDs).
@@ -33,6 +38,13 @@ Before creating a PRD, you MUST have at minimum:
 5. Success Metric: How will you measure if this is successful?
 
 If ANY of these are missing, do NOT generate a PRD. Instead, ask for the missing information in a structured way.
+"""
+
+    # Appended to requests that refine an existing PRD so replies carry only the changed sections
+    EDIT_INSTRUCTIONS = """
+A PRD already exists for this conversation (see Current PRD Content).
+Reply with ONLY the sections you add or change, each under a "## <Section Title>" heading using the template's section titles.
+Do not repeat sections that stay the same.
 """
 
     TEMPLATE_SPECIFIC_PROMPTS = {
@@ -160,6 +172,39 @@ Instructions:
         
         return generation_prompt
     
+    @classmethod
+    def build_section_prompt(cls, template_type: str, section_key: str,
+                             section_data: Dict[str, Any], user_input: str,
+                             project_context: Dict[str, Any] = None) -> str:
+        """Build the user prompt for generating a single template section."""
+        title = section_data.get("title", section_key)
+        prompts = section_data.get("prompts", [])
+        
+        prompt_parts = [f"User's Request: {user_input}"]
+        
+        if project_context:
+            prompt_parts.append(f"Project Context:\n{project_context}")
+        
+        fields = section_data.get("fields", [])
+        
+        section_lines = [f"Write ONLY the **{title}** section of a {template_type} PRD."]
+        if fields:
+            section_lines.append("Write these sub-sections, each under a ### heading:")
+            section_lines.extend(f"- {cls._format_field(field)}" for field in fields)
+        elif prompts:
+            section_lines.append("Guiding questions:")
+            section_lines.extend(f"- {prompt}" for prompt in prompts)
+        prompt_parts.append("\n".join(section_lines))
+        
+        prompt_parts.append(
+            "Instructions:\n"
+            "- Output the section body only, without the section heading\n"
+            "- Do not write any other sections\n"
+            "- Do not ask clarifying questions; state reasonable assumptions instead"
+        )
+        
+        return "\n\n".join(prompt_parts)
+    
     @classmethod
     def _format_template_sections(cls, sections: Dict[str, Any]) -> str:
         """Format template sections for prompt."""
@@ -169,11 +214,25 @@ Instructions:
             required = " (Required)" if section_data.get("required", False) else ""
             prompts = section_data.get("prompts", [])
             
+            fields = section_data.get("fields", [])
+            
             formatted.append(f"**{title}**{required}")
-            if prompts:
+            if fields:
+                formatted.append("  Sub-sections (use these as ### headings):")
+                for field in fields:
+                    formatted.append(f"  - {cls._format_field(field)}")
+            elif prompts:
                 formatted.append("  Guiding questions:")
                 for prompt in prompts:
                     formatted.append(f"  - {prompt}")
             formatted.append("")
         
         return "\n".join(formatted)
+    
+    @staticmethod
+    def _format_field(field: Dict[str, Any]) -> str:
+        """Format a template field with its prompt and constraints, e.g. ``Risks (list, at least 3 items)``."""
+        spec = FieldSpec.from_dict(field["key"], field)
+        hint = spec.hint()
+        line = f"{spec.title} ({hint})" if hint else spec.title
+        return f"{line}: {spec.prompt}" if spec.prompt else line
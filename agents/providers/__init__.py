@@ -0,0 +1,18 @@
+"""LLM provider backends for AI agents."""
+
+from .base import LLMProvider, get_http_client, close_http_clients
+from .openai_provider import OpenAIProvider
+from .ollama_provider import OllamaProvider
+from .fake_provider import FakeProvider, FakeModel
+from .factory import create_provider
+
+__all__ = [
+    "LLMProvider",
+    "OpenAIProvider",
+    "OllamaProvider",
+    "FakeProvider",
+    "FakeModel",
+    "create_provider",
+    "get_http_client",
+    "close_http_clients",
+]
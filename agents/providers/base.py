@@ -0,0 +1,73 @@
+"""Base provider interface and shared HTTP connection pool."""
+
+from typing import Dict, Optional
+
+import httpx
+from agents import Model, ModelProvider
+
+from config import AgentConfig
+
+_http_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def get_http_client(name: str = "default") -> httpx.AsyncClient:
+    """Get a shared keep-alive HTTP client, creating it on first use.
+
+    HTTP/2 is used unless ``LLM_HTTP2`` is off; it needs the ``h2`` package
+    from ``httpx[http2]``, and httpx raises ImportError without it.
+    """
+    client = _http_clients.get(name)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=AgentConfig.LLM_HTTP2,
+            limits=httpx.Limits(
+                max_connections=AgentConfig.LLM_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=AgentConfig.LLM_HTTP_MAX_KEEPALIVE
+            ),
+            timeout=httpx.Timeout(
+                AgentConfig.LLM_HTTP_TIMEOUT,
+                connect=AgentConfig.LLM_HTTP_CONNECT_TIMEOUT
+            )
+        )
+        _http_clients[name] = client
+    return client
+
+
+async def close_http_clients():
+    """Close every shared HTTP client."""
+    for client in list(_http_clients.values()):
+        await client.aclose()
+    _http_clients.clear()
+
+
+class LLMProvider(ModelProvider):
+    """A model backend usable as the Agents SDK ``model_provider``.
+
+    Subclasses build SDK ``Model`` objects; instances are cached per model
+    name so their HTTP clients and connection pools are reused.
+    """
+
+    name = "base"
+    # Whether Agents SDK traces, which carry prompts and outputs, may be exported to OpenAI
+    traced = False
+
+    def __init__(self, default_model: str):
+        self.default_model = default_model
+        self._models: Dict[str, Model] = {}
+
+    def get_model(self, model_name: Optional[str]) -> Model:
+        """Get the (cached) model for a name, falling back to the default model."""
+        model_name = model_name or self.default_model
+        model = self._models.get(model_name)
+        if model is None:
+            model = self._build_model(model_name)
+            self._models[model_name] = model
+        return model
+
+    def _build_model(self, model_name: str) -> Model:
+        """Build a model instance for a name."""
+        raise NotImplementedError
+
+    def validate(self):
+        """Raise ValueError if the provider is missing required configuration."""
+        return None
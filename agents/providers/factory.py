@@ -0,0 +1,21 @@
+"""Provider selection from configuration."""
+
+from config import AgentConfig
+from .base import LLMProvider
+from .openai_provider import OpenAIProvider
+from .ollama_provider import OllamaProvider
+from .fake_provider import FakeProvider
+
+PROVIDERS = {
+    OpenAIProvider.name: OpenAIProvider,
+    OllamaProvider.name: OllamaProvider,
+    FakeProvider.name: FakeProvider,
+}
+
+
+def create_provider(name: str = None) -> LLMProvider:
+    """Create the provider named by ``name`` or ``AgentConfig.LLM_PROVIDER``."""
+    name = (name or AgentConfig.LLM_PROVIDER).lower()
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider: {name}. Expected one of: {', '.join(sorted(PROVIDERS))}")
+    return PROVIDERS[name]()
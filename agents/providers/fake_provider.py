@@ -0,0 +1,149 @@
+"""Deterministic fake provider for tests and benchmarks."""
+
+import asyncio
+import hashlib
+import re
+from typing import Any, AsyncIterator, Callable, Optional
+
+from agents import Model, ModelResponse, Usage
+from openai.types.responses import (
+    Response,
+    ResponseCompletedEvent,
+    ResponseOutputMessage,
+    ResponseOutputText,
+    ResponseTextDeltaEvent,
+)
+
+from config import AgentConfig
+from .base import LLMProvider
+
+_TOKEN_PATTERN = re.compile(r"\S+\s*")
+
+Responder = Callable[[str, str], str]
+
+
+def _input_text(input: Any) -> str:
+    """Flatten SDK input items into plain text."""
+    if isinstance(input, str):
+        return input
+    parts = []
+    for item in input:
+        content = item.get("content") if isinstance(item, dict) else getattr(item, "content", None)
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            parts.extend(str(part.get("text", "")) for part in content if isinstance(part, dict))
+    return "\n".join(parts)
+
+
+def default_responder(system_prompt: str, user_input: str) -> str:
+    """Build a short markdown PRD that depends only on the prompt text."""
+    digest = hashlib.sha256(f"{system_prompt}\n{user_input}".encode("utf-8")).hexdigest()[:12]
+    request = " ".join(user_input.split())[:120]
+    return (
+        f"## Overview\nDraft {digest} for: {request}\n\n"
+        f"## Problem Statement\nUsers need a simpler way to accomplish this task.\n\n"
+        f"## Success Metrics\n- Weekly active usage\n- Task completion rate"
+    )
+
+
+class FakeModel(Model):
+    """A model that answers deterministically without any network access.
+
+    ``latency_ms`` delays the first token and ``tokens_per_second`` paces
+    streamed tokens, so the fake can stand in for a real backend in
+    benchmarks.
+    """
+
+    def __init__(self, model_name: str = "fake", latency_ms: float = 0.0,
+                 tokens_per_second: float = 0.0, responder: Optional[Responder] = None):
+        self.model_name = model_name
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.responder = responder or default_responder
+        self.calls = 0
+
+    async def get_response(self, system_instructions, input, model_settings, tools,
+                           output_schema, handoffs, tracing, *, previous_response_id=None,
+                           conversation_id=None, prompt=None) -> ModelResponse:
+        text, usage = self._respond(system_instructions, input)
+        await self._sleep(self.latency_ms / 1000 + self._generation_seconds(usage.output_tokens))
+        return ModelResponse(output=[self._message(text)], usage=usage, response_id=None)
+
+    async def stream_response(self, system_instructions, input, model_settings, tools,
+                              output_schema, handoffs, tracing, *, previous_response_id=None,
+                              conversation_id=None, prompt=None) -> AsyncIterator[Any]:
+        text, usage = self._respond(system_instructions, input)
+        await self._sleep(self.latency_ms / 1000)
+
+        sequence = 0
+        for token in _TOKEN_PATTERN.findall(text):
+            yield ResponseTextDeltaEvent(
+                type="response.output_text.delta", item_id="fake", output_index=0,
+                content_index=0, delta=token, logprobs=[], sequence_number=sequence
+            )
+            sequence += 1
+            await self._sleep(self._generation_seconds(1))
+
+        yield ResponseCompletedEvent(
+            type="response.completed",
+            sequence_number=sequence,
+            response=Response(
+                id="fake", created_at=0, model=self.model_name, object="response",
+                output=[self._message(text)], tool_choice="none", tools=[], top_p=None,
+                parallel_tool_calls=False, status="completed",
+                usage={
+                    "input_tokens": usage.input_tokens,
+                    "output_tokens": usage.output_tokens,
+                    "total_tokens": usage.total_tokens,
+                    "input_tokens_details": {"cached_tokens": 0, "cache_write_tokens": 0},
+                    "output_tokens_details": {"reasoning_tokens": 0},
+                }
+            )
+        )
+
+    def _respond(self, system_instructions: Optional[str], input: Any):
+        self.calls += 1
+        system_prompt = system_instructions or ""
+        user_input = _input_text(input)
+        text = self.responder(system_prompt, user_input)
+        input_tokens = (len(system_prompt) + len(user_input) + 3) // 4
+        output_tokens = len(_TOKEN_PATTERN.findall(text))
+        usage = Usage(
+            requests=1, input_tokens=input_tokens, output_tokens=output_tokens,
+            total_tokens=input_tokens + output_tokens
+        )
+        return text, usage
+
+    def _generation_seconds(self, tokens: int) -> float:
+        return tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    @staticmethod
+    async def _sleep(seconds: float):
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+
+    @staticmethod
+    def _message(text: str) -> ResponseOutputMessage:
+        return ResponseOutputMessage(
+            id="fake", type="message", role="assistant", status="completed",
+            content=[ResponseOutputText(text=text, type="output_text", annotations=[], logprobs=[])]
+        )
+
+
+class FakeProvider(LLMProvider):
+    """Serves ``FakeModel`` instances for every model name."""
+
+    name = "fake"
+
+    def __init__(self, default_model: str = "fake",
+                 latency_ms: float = AgentConfig.FAKE_LATENCY_MS,
+                 tokens_per_second: float = AgentConfig.FAKE_TOKENS_PER_SECOND,
+                 responder: Optional[Responder] = None):
+        super().__init__(default_model)
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.responder = responder
+
+    def _build_model(self, model_name: str) -> Model:
+        return FakeModel(model_name, self.latency_ms, self.tokens_per_second, self.responder)
@@ -0,0 +1,29 @@
+"""Ollama provider for local models."""
+
+from agents import Model, OpenAIChatCompletionsModel
+from openai import AsyncOpenAI
+
+from config import AgentConfig
+from .base import LLMProvider, get_http_client
+
+
+class OllamaProvider(LLMProvider):
+    """Local models served by Ollama's OpenAI-compatible chat completions endpoint."""
+
+    name = "ollama"
+
+    def __init__(self, default_model: str = AgentConfig.OLLAMA_MODEL,
+                 base_url: str = AgentConfig.OLLAMA_BASE_URL):
+        super().__init__(default_model)
+        self.base_url = base_url.rstrip("/")
+        self._client = None
+
+    def _build_model(self, model_name: str) -> Model:
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                base_url=f"{self.base_url}/v1",
+                # Ollama ignores the key, but the client requires one
+                api_key="ollama",
+                http_client=get_http_client("ollama")
+            )
+        return OpenAIChatCompletionsModel(model=model_name, openai_client=self._client)
@@ -0,0 +1,29 @@
+"""OpenAI provider."""
+
+from agents import Model, OpenAIResponsesModel
+from openai import AsyncOpenAI
+
+from config import AgentConfig
+from .base import LLMProvider, get_http_client
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI models over the Responses API, sharing one keep-alive connection pool."""
+
+    name = "openai"
+    traced = True
+
+    def __init__(self, default_model: str = AgentConfig.OPENAI_MODEL,
+                 api_key: str = AgentConfig.OPENAI_API_KEY):
+        super().__init__(default_model)
+        self.api_key = api_key
+        self._client = None
+
+    def validate(self):
+        if not self.api_key:
+            raise ValueError("OPENAI_API_KEY is required")
+
+    def _build_model(self, model_name: str) -> Model:
+        if self._client is None:
+            self._client = AsyncOpenAI(api_key=self.api_key, http_client=get_http_client("openai"))
+        return OpenAIResponsesModel(model=model_name, openai_client=self._client)
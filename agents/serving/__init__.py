@@ -0,0 +1,6 @@
+"""Response serialization and compression for the AI agents service."""
+
+from .responses import FastJSONResponse, dumps
+from .compression import CompressionMiddleware, accepted_encodings
+
+__all__ = ["FastJSONResponse", "dumps", "CompressionMiddleware", "accepted_encodings"]
@@ -0,0 +1,122 @@
+"""ASGI middleware compressing large responses with brotli or gzip."""
+
+import gzip
+import time
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+from telemetry import record_timing
+
+COMPRESSIBLE_TYPES = (b"application/json", b"text/")
+
+
+def accepted_encodings(header: str) -> set:
+    """The content codings an ``Accept-Encoding`` header allows, ignoring ``q=0`` entries."""
+    accepted = set()
+    for item in header.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(name)
+    return accepted
+
+
+class CompressionMiddleware:
+    """Compresses JSON and text responses of at least ``minimum_size`` bytes.
+
+    Brotli is used when the client accepts it and the ``brotli`` package
+    is installed, gzip otherwise. Only responses sent as a single
+    body are compressed; streamed ones (Server-Sent Events, NDJSON) pass
+    through untouched so every event still reaches the client as soon as
+    it is written. Compression time is reported as the ``compress`` stage
+    of Server-Timing.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        encoding = self._negotiate(scope) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # Held back until the body shows whether it is worth compressing
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            response_start, start = start, None
+            body = message.get("body", b"")
+            if message.get("more_body", False) or not self._compressible(response_start, body):
+                await send(response_start)
+                await send(message)
+                return
+
+            started = time.perf_counter()
+            compressed = self.compress(body, encoding)
+            record_timing("compress", time.perf_counter() - started)
+            headers = [(key, value) for key, value in response_start.get("headers", []) if key.lower() != b"content-length"]
+            headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", b"Accept-Encoding"),
+            ]
+            await send({**response_start, "headers": headers})
+            await send({**message, "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def _negotiate(self, scope) -> Optional[str]:
+        header = b""
+        for key, value in scope["headers"]:
+            if key == b"accept-encoding":
+                header = value
+                break
+        accepted = accepted_encodings(header.decode("latin-1"))
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def _compressible(self, response_start, body: bytes) -> bool:
+        if len(body) < self.minimum_size:
+            return False
+        content_type = b""
+        for key, value in response_start.get("headers", []):
+            key = key.lower()
+            if key == b"content-encoding":
+                return False
+            if key == b"content-type":
+                content_type = value
+        return content_type.startswith(COMPRESSIBLE_TYPES)
@@ -0,0 +1,30 @@
+"""JSON responses serialized with orjson when it is installed."""
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON, with orjson if available and the standard library otherwise."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """A ``JSONResponse`` rendered with ``dumps``.
+
+    Endpoints that return one directly also skip FastAPI's response model
+    validation and ``jsonable_encoder`` pass, so content must already be
+    plain JSON types.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
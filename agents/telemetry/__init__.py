@@ -0,0 +1,18 @@
+"""Telemetry for the AI agents service."""
+
+from .metrics import (
+    REGISTRY, MetricsRegistry, Counter, Gauge, Histogram,
+    start_timings, stop_timings, current_timings, record_timing, format_server_timing,
+    HTTP_REQUEST_SECONDS, HTTP_IN_FLIGHT, TEMPLATE_LOAD_SECONDS, PROMPT_BUILD_SECONDS, QUEUE_WAIT_SECONDS,
+    MODEL_TTFT_SECONDS, MODEL_SECONDS, MODEL_TOKENS
+)
+from .middleware import ServerTimingMiddleware
+from .profiler import SamplingProfiler, ProfilingMiddleware
+
+__all__ = [
+    "REGISTRY", "MetricsRegistry", "Counter", "Gauge", "Histogram",
+    "start_timings", "stop_timings", "current_timings", "record_timing", "format_server_timing",
+    "ServerTimingMiddleware", "SamplingProfiler", "ProfilingMiddleware",
+    "HTTP_REQUEST_SECONDS", "HTTP_IN_FLIGHT", "TEMPLATE_LOAD_SECONDS", "PROMPT_BUILD_SECONDS", "QUEUE_WAIT_SECONDS",
+    "MODEL_TTFT_SECONDS", "MODEL_SECONDS", "MODEL_TOKENS",
+]
@@ -0,0 +1,267 @@
+"""In-process metrics with Prometheus text exposition and per-request Server-Timing."""
+
+import bisect
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar("server_timings", default=None)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+class _Metric:
+    """Shared label handling for counters, gauges and histograms."""
+
+    TYPE = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class _Value(_Metric):
+    """A single number per label set, stored or read from a callback at scrape time.
+
+    A callback returns a number, or a dict mapping label value tuples to
+    numbers; it lets values another component already tracks be exported
+    without updating them twice.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], object]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self.callback = callback
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        if self.callback is not None:
+            try:
+                result = self.callback()
+            except Exception:
+                return []
+            values = sorted(result.items()) if isinstance(result, dict) else [((), result)]
+        else:
+            with self._lock:
+                values = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values
+        ]
+
+
+class Counter(_Value):
+    """A monotonically increasing value per label set."""
+
+    TYPE = "counter"
+
+
+class Gauge(_Value):
+    """A value that goes up and down."""
+
+    TYPE = "gauge"
+
+    def set(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1.0, **labels: str):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts, sum and count per label set."""
+
+    TYPE = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    @contextmanager
+    def time(self, timing: Optional[str] = None, **labels: str) -> Iterator[None]:
+        """Observe the duration of the block, also adding it to Server-Timing as ``timing``."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.observe(elapsed, **labels)
+            if timing is not None:
+                record_timing(timing, elapsed)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._values.items())
+        lines = self.header()
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames + ('le',), key + (_format_value(bound),))} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metrics by name and renders them in the Prometheus text format."""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                callback: Optional[Callable[[], object]] = None) -> Counter:
+        return self.register(Counter(name, documentation, labelnames, callback))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              callback: Optional[Callable[[], object]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def unregister(self, name: str):
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def start_timings() -> contextvars.Token:
+    """Start collecting Server-Timing entries for the current request."""
+    return _timings.set([])
+
+
+def current_timings() -> List[Tuple[str, float]]:
+    """Get the entries recorded for the current request so far."""
+    return list(_timings.get() or ())
+
+
+def stop_timings(token: contextvars.Token):
+    """Stop collecting the entries started by ``start_timings``."""
+    _timings.reset(token)
+
+
+def record_timing(name: str, seconds: float):
+    """Add a stage duration to the current request's Server-Timing, if one is being collected."""
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+def format_server_timing(timings: List[Tuple[str, float]]) -> str:
+    """Format entries as a Server-Timing header, summing repeated stages."""
+    totals: Dict[str, float] = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in totals.items())
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "pmhelper_http_request_duration_seconds", "HTTP request duration until the response starts",
+    ("method", "route", "status")
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge("pmhelper_http_requests_in_flight", "HTTP requests being handled")
+TEMPLATE_LOAD_SECONDS = REGISTRY.histogram(
+    "pmhelper_template_load_seconds", "Time to read and compile a template file", ("kind",)
+)
+PROMPT_BUILD_SECONDS = REGISTRY.histogram(
+    "pmhelper_prompt_build_seconds", "Time to assemble the system prompt and fit context to the budget"
+)
+QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "pmhelper_llm_queue_wait_seconds", "Time model calls waited for an admission slot", ("priority",)
+)
+MODEL_TTFT_SECONDS = REGISTRY.histogram(
+    "pmhelper_llm_time_to_first_token_seconds", "Time from a streamed model call to its first token", ("model",)
+)
+MODEL_SECONDS = REGISTRY.histogram(
+    "pmhelper_llm_call_seconds", "Total model call duration", ("model", "route")
+)
+MODEL_TOKENS = REGISTRY.counter(
+    "pmhelper_llm_tokens_total", "Tokens sent to and generated by the model", ("model", "direction")
+)
@@ -0,0 +1,69 @@
+"""ASGI middleware timing HTTP requests and reporting stage timings."""
+
+import time
+from typing import Any, Dict
+
+from .metrics import (
+    HTTP_IN_FLIGHT, HTTP_REQUEST_SECONDS, current_timings, format_server_timing, record_timing, start_timings,
+    stop_timings
+)
+
+
+class ServerTimingMiddleware:
+    """Records request duration histograms and adds a ``Server-Timing`` header.
+
+    Stages recorded with ``record_timing`` while the request is handled,
+    such as prompt building, queue wait and model time, are reported along
+    with ``total``, the time until the response starts. Streaming responses
+    start before the model is called, so they only carry what preceded it.
+    Requests are labelled with their route template rather than the raw
+    path to keep label cardinality bounded.
+    """
+
+    def __init__(self, app, server_timing: bool = True):
+        self.app = app
+        self.server_timing = server_timing
+        self._routes: Dict[Any, str] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        token = start_timings()
+        HTTP_IN_FLIGHT.inc()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - started
+                HTTP_REQUEST_SECONDS.observe(
+                    elapsed, method=scope["method"], route=self._route(scope), status=str(message["status"])
+                )
+                if self.server_timing:
+                    record_timing("total", elapsed)
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", format_server_timing(current_timings()).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            stop_timings(token)
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+
+        route = self._routes.get(endpoint)
+        if route is None:
+            app = scope.get("app")
+            for candidate in getattr(app, "routes", ()):
+                if getattr(candidate, "endpoint", None) is endpoint:
+                    route = candidate.path
+                    break
+            self._routes[endpoint] = route = route or "unmatched"
+        return route
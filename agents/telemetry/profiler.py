@@ -0,0 +1,229 @@
+"""Opt-in sampling profiler writing collapsed stacks per request."""
+
+import asyncio
+import contextvars
+import hmac
+import itertools
+import os
+import random
+import re
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+IDLE_FRAME = "<idle>"
+OTHER_FRAME = "<other tasks>"
+
+_PROFILE_NAME = re.compile(r"^[\w.-]+\.folded$")
+
+_active_profile: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("active_profile", default=None)
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame) -> str:
+    """Render a frame's stack root first, as one collapsed-stack line."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class ProfileSession:
+    """Stack sample counts for one profiled request."""
+
+    __slots__ = ("profile_id", "name", "thread_id", "loop", "samples", "context_token")
+
+    def __init__(self, profile_id: int, label: str, thread_id: int, loop: asyncio.AbstractEventLoop):
+        self.profile_id = profile_id
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+        label = re.sub(r"[^\w-]+", "_", label).strip("_") or "request"
+        self.name = f"{stamp}-{label}-{os.getpid()}-{profile_id}.folded"
+        self.thread_id = thread_id
+        self.loop = loop
+        self.samples: Counter = Counter()
+        self.context_token: Optional[contextvars.Token] = None
+
+
+class SamplingProfiler:
+    """Samples the event loop thread's stack while profiled requests run.
+
+    A sampler thread wakes every ``interval`` seconds, but only while at
+    least one request is being profiled, so the profiler costs nothing
+    otherwise. Each sample is attributed by the task running on the loop.
+    Stacks of the request's task and of the tasks it starts, tracked by a
+    task factory installed only while profiling, are recorded in full. Time
+    in other requests' tasks, or with no task running (the loop waiting on
+    the model, for instance), is recorded as ``<other tasks>`` or
+    ``<idle>``, so sample counts reflect wall time. Requests shorter than ``interval`` may have no samples.
+    Stacks are written in the collapsed format read by flamegraph.pl and
+    speedscope, one file per request, keeping the newest ``max_files``.
+    """
+
+    def __init__(self, output_dir: str = "data/profiles", interval: float = 0.005, max_files: int = 200):
+        self.output_dir = Path(output_dir)
+        self.interval = interval
+        self.max_files = max_files
+        self._sessions: Dict[int, ProfileSession] = {}
+        # Tasks created under a profiled request, recorded by a task factory installed while profiling
+        self._tasks: "weakref.WeakKeyDictionary[asyncio.Task, int]" = weakref.WeakKeyDictionary()
+        self._previous_factories: Dict[asyncio.AbstractEventLoop, Any] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+
+    def start(self, label: str) -> ProfileSession:
+        """Start profiling the calling task and the tasks it creates."""
+        loop = asyncio.get_running_loop()
+        session = ProfileSession(next(self._ids), label, threading.get_ident(), loop)
+        session.context_token = _active_profile.set(session.profile_id)
+        self._tasks[asyncio.current_task()] = session.profile_id
+        if loop not in self._previous_factories:
+            self._previous_factories[loop] = loop.get_task_factory()
+            loop.set_task_factory(self._task_factory)
+        with self._lock:
+            self._sessions[session.profile_id] = session
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+                self._sampler.start()
+        return session
+
+    async def stop(self, session: ProfileSession) -> Path:
+        """Stop profiling a request and write its collapsed stacks; returns the file written.
+
+        Must be called from the task that called ``start``. The file is
+        written on a worker thread, off the event loop.
+        """
+        with self._lock:
+            self._sessions.pop(session.profile_id, None)
+            loop_profiled = any(other.loop is session.loop for other in self._sessions.values())
+        if session.context_token is not None:
+            _active_profile.reset(session.context_token)
+            session.context_token = None
+        self._tasks.pop(asyncio.current_task(), None)
+        if not loop_profiled and session.loop in self._previous_factories:
+            session.loop.set_task_factory(self._previous_factories.pop(session.loop))
+        return await asyncio.to_thread(self._write, session)
+
+    def _write(self, session: ProfileSession) -> Path:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = self.output_dir / session.name
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in session.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        self._prune()
+        return path
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """List written profiles, newest first."""
+        if not self.output_dir.exists():
+            return []
+
+        profiles = []
+        for path in self.output_dir.glob("*.folded"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            profiles.append({"name": path.name, "size_bytes": stat.st_size, "created_at": stat.st_mtime})
+        profiles.sort(key=lambda profile: profile["created_at"], reverse=True)
+        return profiles
+
+    def read_profile(self, name: str) -> Optional[str]:
+        """Read a profile by file name, or None if there is no such profile."""
+        if not _PROFILE_NAME.match(name):
+            return None
+        try:
+            return (self.output_dir / name).read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    def _sample_loop(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                sessions = list(self._sessions.values())
+                if not sessions:
+                    self._sampler = None
+                    return
+
+            frames = sys._current_frames()
+            for session in sessions:
+                frame = frames.get(session.thread_id)
+                if frame is None:
+                    continue
+                task = asyncio.current_task(session.loop)
+                if task is None:
+                    stack = IDLE_FRAME
+                elif self._tasks.get(task) == session.profile_id:
+                    stack = _collapse(frame)
+                else:
+                    stack = OTHER_FRAME
+                session.samples[stack] += 1
+
+    def _task_factory(self, loop: asyncio.AbstractEventLoop, coro, **kwargs) -> asyncio.Task:
+        previous = self._previous_factories.get(loop)
+        task = previous(loop, coro, **kwargs) if previous is not None else asyncio.Task(coro, loop=loop, **kwargs)
+        profile_id = _active_profile.get()
+        if profile_id is not None:
+            self._tasks[task] = profile_id
+        return task
+
+    def _prune(self):
+        for profile in self.list_profiles()[self.max_files:]:
+            try:
+                (self.output_dir / profile["name"]).unlink()
+            except OSError:
+                pass
+
+
+class ProfilingMiddleware:
+    """Profiles requests that send an ``X-Profile`` header, or a random ``sample_rate`` share of them.
+
+    The header must equal ``token``; without a token the header is ignored
+    and only sampling applies. The profile file name is returned in an
+    ``X-Profile-Id`` response header. Install this middleware
+    only when profiling is enabled; requests then pay one header lookup.
+    """
+
+    def __init__(self, app, profiler: SamplingProfiler, sample_rate: float = 0.0, token: str = ""):
+        self.app = app
+        self.profiler = profiler
+        self.sample_rate = sample_rate
+        self.token = token.encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        session = self.profiler.start(f"{scope['method']}-{scope['path']}")
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((PROFILE_ID_HEADER, session.name.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            await self.profiler.stop(session)
+
+    def _wanted(self, scope) -> bool:
+        for key, value in scope["headers"]:
+            if key == PROFILE_HEADER:
+                return bool(self.token) and hmac.compare_digest(value, self.token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
@@ -1,6 +1,11 @@
 """Tools module for AI agents."""
 
 from .template_loader import TemplateLoader
+from .section_parser import SectionParser
+from .template_model import CompiledTemplate, SectionSpec, FieldSpec, KIND_PRD, KIND_SPEC, KIND_PMD
 from .prd_validator import PRDValidator
 
-__all__ = ["TemplateLoader", "PRDValidator"]
+__all__ = [
+    "TemplateLoader", "CompiledTemplate", "SectionSpec", "FieldSpec",
+    "KIND_PRD", "KIND_SPEC", "KIND_PMD", "PRDValidator", "SectionParser",
+]
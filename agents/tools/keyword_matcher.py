@@ -0,0 +1,29 @@
+"""Keyword matching for the validator's requirement detection."""
+
+from typing import FrozenSet, Iterable, Mapping, Tuple
+
+
+class KeywordMatcher:
+    """Maps keywords to the classes they signal.
+
+    ``scan`` reports every class with at least one keyword occurring as a
+    substring of the text. Each check is a ``keyword in text`` search, which
+    runs in C and beats both a pure-Python automaton and a compiled regex
+    alternation on this small keyword set; a class stops at its first hit.
+    """
+
+    def __init__(self, keyword_classes: Mapping[str, Iterable[str]]):
+        self.classes: FrozenSet[str] = frozenset(keyword_classes)
+        self._groups: Tuple[Tuple[str, Tuple[str, ...]], ...] = tuple(
+            (class_name, tuple(keywords)) for class_name, keywords in keyword_classes.items()
+        )
+
+    def scan(self, text: str) -> FrozenSet[str]:
+        """Return the classes whose keywords occur in ``text``."""
+        found = []
+        for class_name, keywords in self._groups:
+            for keyword in keywords:
+                if keyword in text:
+                    found.append(class_name)
+                    break
+        return frozenset(found)
@@ -1,7 +1,12 @@
 """PRD validation utilities."""
 
-from typing import Dict, Any, List, Tuple
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, List, Tuple
+import hashlib
 import re
+import threading
+
+from .keyword_matcher import KeywordMatcher
 
 class PRDValidator:
     """Validates PRD content and completeness."""
@@ -15,7 +20,29 @@ class PRDValidator:
         "success_metrics": "Success Metrics"
     }
     
-    def __init__(self):
+    # Product name patterns, tried in order
+    PRODUCT_PATTERNS = [
+        re.compile(pattern, re.IGNORECASE) for pattern in (
+            r"(?:product|app|feature|tool|system|platform)\s+(?:called|named)\s+([^\s,\.]+)",
+            r"building\s+(?:a|an)?\s*([^\s,\.]+)",
+            r"create\s+(?:a|an)?\s*([^\s,\.]+)",
+            # A whole word before app/product/feature; the former nested
+            # quantifier matched the same words but backtracked exponentially
+            r"(?<![a-zA-Z])([a-zA-Z]{2,})\s+(?:app|product|feature)"
+        )
+    ]
+    
+    # Keywords that signal each requirement anywhere in the (lowercased) input
+    REQUIREMENT_KEYWORDS = {
+        "problem_statement": ["problem", "issue", "challenge", "pain point", "struggle", "difficulty"],
+        "target_users": ["users", "customers", "audience", "people", "target", "for"],
+        "core_functionality": ["features", "functionality", "does", "capabilities", "functions"],
+        "success_metrics": ["success", "metrics", "kpi", "measure", "goal", "target"]
+    }
+    
+    _keyword_matcher = KeywordMatcher(REQUIREMENT_KEYWORDS)
+    
+    def __init__(self, cache_size: int = 4096):
         self.validation_rules = {
             "product_name": self._validate_product_name,
             "problem_statement": self._validate_problem_statement,
@@ -23,57 +50,74 @@ class PRDValidator:
             "core_functionality": self._validate_core_functionality,
             "success_metrics": self._validate_success_metrics
         }
+        self.cache_size = cache_size
+        self._results: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0}
     
     def validate_user_input(self, user_input: str) -> Dict[str, Any]:
-        """Validate user input and extract information."""
+        """Validate user input and extract information.
+        
+        Results are memoized per input hash, so re-validating the same text
+        is a dictionary lookup.
+        """
+        key = hashlib.blake2b(user_input.encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                self._results.move_to_end(key)
+                self._counters["hits"] += 1
+                return self._copy_result(cached)
+            self._counters["misses"] += 1
+        
         extracted_info = self._extract_information(user_input)
         missing_info = self._check_missing_requirements(extracted_info)
-        
-        return {
+        result = {
             "extracted_info": extracted_info,
             "missing_info": missing_info,
             "is_sufficient": len(missing_info) == 0,
             "completeness_score": self._calculate_completeness(extracted_info)
         }
+        
+        with self._lock:
+            self._results[key] = result
+            while len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
+        return self._copy_result(result)
+    
+    def validate_many(self, user_inputs: Iterable[str]) -> List[Dict[str, Any]]:
+        """Validate many inputs, in order; repeated inputs are validated once."""
+        return [self.validate_user_input(user_input) for user_input in user_inputs]
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Get memoization counters."""
+        return {**self._counters, "cached_results": len(self._results), "max_results": self.cache_size}
+    
+    @staticmethod
+    def _copy_result(result: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy the mutable parts of a cached result so callers cannot alter the cache."""
+        return {
+            **result,
+            "extracted_info": dict(result["extracted_info"]),
+            "missing_info": list(result["missing_info"])
+        }
     
     def _extract_information(self, text: str) -> Dict[str, str]:
         """Extract PRD information from user input."""
         info = {}
-        text_lower = text.lower()
         
         # Product name extraction
-        product_patterns = [
-            r"(?:product|app|feature|tool|system|platform)\s+(?:called|named)\s+([^\s,\.]+)",
-            r"building\s+(?:a|an)?\s*([^\s,\.]+)",
-            r"create\s+(?:a|an)?\s*([^\s,\.]+)",
-            r"([A-Z][a-zA-Z]+(?:[A-Z][a-zA-Z]*)*)\s+(?:app|product|feature)"
-        ]
-        
-        for pattern in product_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        for pattern in self.PRODUCT_PATTERNS:
+            match = pattern.search(text)
             if match:
                 info["product_name"] = match.group(1).strip()
                 break
         
-        # Problem statement extraction
-        problem_keywords = ["problem", "issue", "challenge", "pain point", "struggle", "difficulty"]
-        if any(keyword in text_lower for keyword in problem_keywords):
-            info["problem_statement"] = "detected"
-        
-        # Target users extraction
-        user_keywords = ["users", "customers", "audience", "people", "target", "for"]
-        if any(keyword in text_lower for keyword in user_keywords):
-            info["target_users"] = "detected"
-        
-        # Core functionality extraction
-        feature_keywords = ["features", "functionality", "does", "capabilities", "functions"]
-        if any(keyword in text_lower for keyword in feature_keywords):
-            info["core_functionality"] = "detected"
-        
-        # Success metrics extraction
-        metric_keywords = ["success", "metrics", "kpi", "measure", "goal", "target"]
-        if any(keyword in text_lower for keyword in metric_keywords):
-            info["success_metrics"] = "detected"
+        # Every other requirement is detected by keyword
+        found = self._keyword_matcher.scan(text.lower())
+        for requirement in self.REQUIREMENT_KEYWORDS:
+            if requirement in found:
+                info[requirement] = "detected"
         
         return info
     
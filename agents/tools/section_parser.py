@@ -0,0 +1,135 @@
+"""Incremental mapping of markdown model output onto template section keys."""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+_HEADING_PATTERN = re.compile(r"^\s{0,3}#{1,4}\s+(.+?)\s*#*\s*$")
+_BOLD_HEADING_PATTERN = re.compile(r"^\s*\*\*([^*]+?)\*\*:?\s*$")
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = frozenset({"and", "the", "of", "a", "an", "for", "to", "section"})
+
+
+def _words(text: str) -> frozenset:
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text).lower().replace("&", " and ")
+    return frozenset(word for word in _WORD_PATTERN.findall(text) if word not in _STOP_WORDS and not word.isdigit())
+
+
+class SectionParser:
+    """Splits streamed markdown into the sections of a template.
+
+    Headings are matched to section keys by title or key, ignoring case,
+    numbering and punctuation, falling back to the section whose title
+    shares the most words. Text before the first recognised heading is
+    ignored, and unrecognised headings, or headings matching the section
+    already being read, stay in the current section's body.
+
+    ``feed_events`` and ``close_events`` report the same parse as stream
+    events: ``section`` when a heading starts, with its title and matched
+    key (None for markdown headings that match no section), and
+    ``section_done`` when a section's content is complete.
+    """
+
+    def __init__(self, template_sections: Dict[str, Any], min_overlap: float = 0.5):
+        self.min_overlap = min_overlap
+        self._index = [
+            (key, _words(section_data.get("title", key)) | _words(key))
+            for key, section_data in template_sections.items()
+        ]
+        self._exact = {}
+        for key, section_data in template_sections.items():
+            self._exact[_words(key)] = key
+            self._exact[_words(section_data.get("title", key))] = key
+        self._line = ""
+        self._current: Optional[str] = None
+        self._lines: List[str] = []
+        self.sections: Dict[str, str] = {}
+
+    def match(self, heading: str) -> Optional[str]:
+        """Map a heading's text to a section key, or None."""
+        words = _words(heading)
+        if not words:
+            return None
+        if words in self._exact:
+            return self._exact[words]
+
+        best_key, best_score = None, 0.0
+        for key, section_words in self._index:
+            score = len(words & section_words) / len(words | section_words)
+            if score > best_score:
+                best_key, best_score = key, score
+        return best_key if best_score >= self.min_overlap else None
+
+    def feed(self, delta: str) -> List[str]:
+        """Consume a chunk of output and return the keys of sections completed by it."""
+        return [event["key"] for event in self.feed_events(delta) if event["type"] == "section_done"]
+
+    def feed_events(self, delta: str) -> List[Dict[str, Any]]:
+        """Consume a chunk of output and return the ``section`` and ``section_done`` events in it."""
+        self._line += delta
+        *lines, self._line = self._line.split("\n")
+        events = []
+        for line in lines:
+            title, key = self._heading(line)
+            # A sub-heading that resembles the enclosing section belongs to its body
+            if key is None or key == self._current:
+                if title is not None:
+                    events.append({"type": "section", "title": title, "key": key})
+                if self._current is not None:
+                    self._lines.append(line)
+                continue
+            if self._finish():
+                events.append({"type": "section_done", "key": self._current})
+            events.append({"type": "section", "title": title, "key": key})
+            self._current = key
+            self._lines = []
+        return events
+
+    def close(self) -> Dict[str, str]:
+        """Flush the final section and return every parsed section."""
+        self.close_events()
+        return self.sections
+
+    def close_events(self) -> List[Dict[str, Any]]:
+        """Flush the trailing line and the final section, returning their events."""
+        events = self.feed_events("\n") if self._line else []
+        if self._finish():
+            events.append({"type": "section_done", "key": self._current})
+        self._current = None
+        self._lines = []
+        return events
+
+    def parse(self, content: str) -> Dict[str, str]:
+        """Parse a complete document."""
+        self.feed(content)
+        return self.close()
+
+    def heading_key(self, line: str) -> Optional[str]:
+        """Map a markdown heading line to a section key, or None if it is not a section heading."""
+        return self._heading(line)[1]
+
+    def _heading(self, line: str) -> Tuple[Optional[str], Optional[str]]:
+        """The title and section key of a heading line.
+
+        Bold lines only count as headings when they match a section.
+        """
+        match = _HEADING_PATTERN.match(line)
+        if match:
+            title = match.group(1).strip("*_ ")
+            return title, self.match(title)
+        match = _BOLD_HEADING_PATTERN.match(line)
+        if match:
+            title = match.group(1).strip("*_ ")
+            key = self.match(title)
+            if key is not None:
+                return title, key
+        return None, None
+
+    def _finish(self) -> bool:
+        """Store the section being read; returns whether it had any content."""
+        if self._current is None:
+            return False
+        body = "\n".join(self._lines).strip()
+        if not body:
+            return False
+        self.sections[self._current] = body
+        return True
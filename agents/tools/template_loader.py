@@ -1,109 +1,260 @@
 """Template loading utilities for PRD generation."""
 
 import json
-import os
-from typing import Dict, Any, List, Optional
+import threading
+from typing import Dict, Any, Callable, List, Optional, Tuple
 from pathlib import Path
 
+try:
+    import yaml
+except ImportError:  # pragma: no cover - reported when a YAML template is found
+    yaml = None
+
+from telemetry import TEMPLATE_LOAD_SECONDS
+from .template_model import KIND_PMD, KIND_PRD, KIND_SPEC, CompiledTemplate, normalize_pmd_template
+
+ReloadListener = Callable[[List[str]], None]
+
+# (path, kind, mtime_ns, size) per template type
+Signature = Dict[str, Tuple[str, str, int, int]]
+
+
+class _TemplateIndex:
+    """An immutable snapshot of every template and its precomputed lookups."""
+
+    __slots__ = ("signature", "templates", "compiled", "types", "info")
+
+    def __init__(self, signature: Signature, templates: Dict[str, Dict[str, Any]],
+                 compiled: Dict[str, CompiledTemplate]):
+        self.signature = signature
+        self.templates = templates
+        self.compiled = compiled
+        self.types = sorted(templates)
+        self.info = {
+            template_type: {
+                "name": template.name,
+                "description": template.description,
+                "template_type": template_type,
+                "kind": template.kind,
+                "sections": list(template.sections),
+                "required_sections": list(template.required)
+            }
+            for template_type, template in compiled.items()
+        }
+
+
 class TemplateLoader:
-    """Loads and manages PRD templates."""
-    
-    def __init__(self, templates_path: str = "../backend/templates"):
+    """Loads and manages PRD, spec and PMD templates.
+
+    Three formats are recognised: ``*-prd.json`` PRD templates,
+    ``specs/*-spec.json`` spec templates and the nested YAML
+    ``pmd_template.yaml``, which is converted to the JSON layout and needs
+    PyYAML; a YAML template without it fails the load instead of being
+    skipped. Each template is also compiled once into a
+    ``CompiledTemplate`` whose field constraints drive validation and output
+    budgeting.
+
+    Templates are read into an in-memory index when the loader is created,
+    so lookups never touch the disk. ``refresh`` stats the template files
+    and, if any were added, removed or modified, rebuilds the index and
+    swaps it in atomically; unchanged templates keep their parsed objects.
+    ``start_watching`` runs ``refresh`` on a background thread every
+    ``poll_interval`` seconds.
+    """
+
+    # (glob, suffix stripped from the file stem, kind); the first file found for a type wins
+    FILE_PATTERNS = (
+        ("*-prd.json", "-prd", KIND_PRD),
+        ("specs/*-spec.json", "-spec", KIND_SPEC),
+        ("pmd_template.yaml", "_template", KIND_PMD),
+    )
+
+    def __init__(self, templates_path: str = "../backend/templates", poll_interval: float = 2.0):
         self.templates_path = Path(templates_path)
-        self._templates_cache: Dict[str, Dict[str, Any]] = {}
-    
+        self.poll_interval = poll_interval
+        self._listeners: List[ReloadListener] = []
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._index = _TemplateIndex({}, {}, {})
+        self.refresh()
+
+    def refresh(self) -> List[str]:
+        """Reload templates whose files changed; returns the changed template types."""
+        with self._refresh_lock:
+            current = self._index
+            signature = self._scan()
+            if signature == current.signature:
+                return []
+
+            templates: Dict[str, Dict[str, Any]] = {}
+            compiled: Dict[str, CompiledTemplate] = {}
+            changed = []
+            for template_type, stamp in signature.items():
+                if current.signature.get(template_type) == stamp:
+                    templates[template_type] = current.templates[template_type]
+                    compiled[template_type] = current.compiled[template_type]
+                    continue
+
+                path, kind = stamp[0], stamp[1]
+                with TEMPLATE_LOAD_SECONDS.time(kind=kind):
+                    template = self._read(Path(path), kind)
+                    if template is not None:
+                        compiled[template_type] = CompiledTemplate(template_type, kind, template)
+                if template is None:
+                    # Keep serving the last good version of a broken file
+                    if template_type in current.templates:
+                        templates[template_type] = current.templates[template_type]
+                        compiled[template_type] = current.compiled[template_type]
+                    continue
+                templates[template_type] = template
+                changed.append(template_type)
+
+            changed.extend(template_type for template_type in current.templates if template_type not in templates)
+            self._index = _TemplateIndex(signature, templates, compiled)
+
+        if changed:
+            for listener in self._listeners:
+                try:
+                    listener(changed)
+                except Exception as e:
+                    print(f"Error in template reload listener: {e}")
+        return changed
+
+    def add_listener(self, listener: ReloadListener):
+        """Call ``listener`` with the changed template types after each reload."""
+        self._listeners.append(listener)
+
+    def start_watching(self):
+        """Poll the template directory for changes on a background thread."""
+        if self._watcher is not None or self.poll_interval <= 0:
+            return
+
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="template-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        """Stop the background poller."""
+        if self._watcher is None:
+            return
+
+        self._stop.set()
+        self._watcher.join()
+        self._watcher = None
+
     def load_template(self, template_type: str) -> Optional[Dict[str, Any]]:
         """Load a specific template by type."""
-        if template_type in self._templates_cache:
-            return self._templates_cache[template_type]
-        
-        template_file = self.templates_path / f"{template_type}-prd.json"
-        
-        if not template_file.exists():
-            return None
-        
-        try:
-            with open(template_file, 'r', encoding='utf-8') as f:
-                template = json.load(f)
-            
-            self._templates_cache[template_type] = template
-            return template
-        except (json.JSONDecodeError, IOError) as e:
-            print(f"Error loading template {template_type}: {e}")
-            return None
-    
-    def get_available_templates(self) -> List[str]:
-        """Get list of available template types."""
-        if not self.templates_path.exists():
-            return []
-        
-        templates = []
-        for file in self.templates_path.glob("*-prd.json"):
-            template_type = file.stem.replace("-prd", "")
-            templates.append(template_type)
-        
-        return sorted(templates)
-    
+        return self._index.templates.get(template_type)
+
+    def get_available_templates(self, kind: Optional[str] = None) -> List[str]:
+        """Get list of available template types, optionally only those of one kind."""
+        if kind is None:
+            return list(self._index.types)
+        return [template_type for template_type in self._index.types if self._index.compiled[template_type].kind == kind]
+
     def get_template_sections(self, template_type: str) -> Dict[str, Any]:
         """Get sections for a specific template."""
-        template = self.load_template(template_type)
+        template = self._index.templates.get(template_type)
         if not template:
             return {}
-        
+
         return template.get("sections", {})
-    
+
+    def get_compiled_template(self, template_type: str) -> Optional[CompiledTemplate]:
+        """Get the compiled form of a template, with its field constraints."""
+        return self._index.compiled.get(template_type)
+
+    def get_template_kind(self, template_type: str) -> Optional[str]:
+        """Get whether a template is a ``prd``, ``spec`` or ``pmd`` template."""
+        compiled = self._index.compiled.get(template_type)
+        return compiled.kind if compiled else None
+
     def get_required_sections(self, template_type: str) -> List[str]:
         """Get required sections for a template."""
-        sections = self.get_template_sections(template_type)
-        required = []
-        
-        for section_key, section_data in sections.items():
-            if section_data.get("required", False):
-                required.append(section_key)
-        
-        return required
-    
+        compiled = self._index.compiled.get(template_type)
+        return list(compiled.required) if compiled else []
+
     def get_section_prompts(self, template_type: str, section_key: str) -> List[str]:
         """Get prompts for a specific section."""
         sections = self.get_template_sections(template_type)
         section = sections.get(section_key, {})
         return section.get("prompts", [])
-    
+
     def validate_template_data(self, template_type: str, data: Dict[str, Any]) -> Dict[str, List[str]]:
-        """Validate PRD data against template requirements."""
-        template = self.load_template(template_type)
-        if not template:
+        """Validate PRD data against template requirements and field constraints."""
+        compiled = self._index.compiled.get(template_type)
+        if not compiled:
             return {"errors": [f"Template {template_type} not found"]}
-        
-        sections = template.get("sections", {})
+
         errors = []
         missing_required = []
-        
+
         # Check required sections
-        for section_key, section_data in sections.items():
-            if section_data.get("required", False):
-                if section_key not in data or not data[section_key].strip():
-                    missing_required.append(section_data.get("title", section_key))
-        
+        for section_key in compiled.required:
+            content = data.get(section_key)
+            if not content or (isinstance(content, str) and not content.strip()):
+                missing_required.append(compiled.sections[section_key].title)
+
         if missing_required:
             errors.append(f"Missing required sections: {', '.join(missing_required)}")
-        
+
+        violations = compiled.check(data)
+        for violation in violations:
+            errors.append(
+                f"{violation['section']}.{violation['field']} violates {violation['constraint']} "
+                f"{violation['limit']} (got {violation['actual']})"
+            )
+
         return {
             "errors": errors,
             "missing_required": missing_required,
+            "constraint_violations": violations,
             "is_valid": len(errors) == 0
         }
-    
+
     def get_template_info(self, template_type: str) -> Dict[str, Any]:
         """Get comprehensive template information."""
-        template = self.load_template(template_type)
-        if not template:
+        info = self._index.info.get(template_type)
+        if not info:
             return {}
-        
-        return {
-            "name": template.get("name", ""),
-            "description": template.get("description", ""),
-            "template_type": template.get("templateType", template_type),
-            "sections": list(template.get("sections", {}).keys()),
-            "required_sections": self.get_required_sections(template_type)
-        }
+
+        return {**info, "sections": list(info["sections"]), "required_sections": list(info["required_sections"])}
+
+    def _scan(self) -> Signature:
+        """Stat every template file, keyed by template type."""
+        if not self.templates_path.exists():
+            return {}
+
+        signature = {}
+        for pattern, suffix, kind in self.FILE_PATTERNS:
+            for file in sorted(self.templates_path.glob(pattern)):
+                if kind == KIND_PMD and yaml is None:
+                    raise RuntimeError(f"PyYAML is required to load the {file.name} template")
+                template_type = file.stem[:-len(suffix)] if file.stem.endswith(suffix) else file.stem
+                if template_type in signature:
+                    continue
+                try:
+                    stat = file.stat()
+                except OSError:
+                    continue
+                signature[template_type] = (str(file), kind, stat.st_mtime_ns, stat.st_size)
+        return signature
+
+    def _read(self, template_file: Path, kind: str) -> Optional[Dict[str, Any]]:
+        """Parse a template file into the JSON template layout."""
+        try:
+            with open(template_file, 'r', encoding='utf-8') as f:
+                if kind == KIND_PMD:
+                    return normalize_pmd_template(yaml.safe_load(f) or {})
+                return json.load(f)
+        except Exception as e:
+            print(f"Error loading template {template_file.name}: {e}")
+            return None
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing templates: {e}")
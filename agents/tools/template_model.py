@@ -0,0 +1,256 @@
+"""Compiled template model shared by the PRD, spec and PMD template formats."""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from .section_parser import SectionParser
+
+KIND_PRD = "prd"
+KIND_SPEC = "spec"
+KIND_PMD = "pmd"
+
+FIELD_TEXT = "text"
+FIELD_LIST = "list"
+
+# Output estimates for fields that declare no length, ~4 chars per token
+TOKENS_PER_LIST_ITEM = 40
+DEFAULT_LIST_ITEMS = 5
+DEFAULT_FIELD_TOKENS = 150
+DEFAULT_SECTION_TOKENS = 300
+
+_LIST_ITEM_PATTERN = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+\S", re.MULTILINE)
+_PLACEHOLDER_PATTERN = re.compile(r"\{\{.*?\}\}")
+_SMALL_WORDS = frozenset({"and", "or", "of", "the", "to", "for"})
+
+
+def humanize(key: str) -> str:
+    """Turn a ``snake_case`` key into a title."""
+    words = key.split("_")
+    return " ".join(
+        word if index and word in _SMALL_WORDS else word.capitalize()
+        for index, word in enumerate(words)
+    )
+
+
+def count_list_items(content: Any) -> int:
+    """Count the items in a list field, given as a list or as markdown."""
+    if isinstance(content, (list, tuple)):
+        return len(content)
+    return len(_LIST_ITEM_PATTERN.findall(content or ""))
+
+
+class FieldSpec:
+    """The constraints on one field of a section, or on a whole section."""
+
+    __slots__ = ("key", "title", "prompt", "kind", "required", "max_length", "min_items", "max_items")
+
+    def __init__(self, key: str, title: str, prompt: str = "", kind: str = FIELD_TEXT, required: bool = True,
+                 max_length: Optional[int] = None, min_items: Optional[int] = None, max_items: Optional[int] = None):
+        self.key = key
+        self.title = title
+        self.prompt = prompt
+        self.kind = kind
+        self.required = required
+        self.max_length = max_length
+        self.min_items = min_items
+        self.max_items = max_items
+
+    @classmethod
+    def from_dict(cls, key: str, data: Dict[str, Any]) -> "FieldSpec":
+        return cls(
+            key,
+            data.get("title", humanize(key)),
+            data.get("prompt", ""),
+            FIELD_LIST if data.get("type") == FIELD_LIST else FIELD_TEXT,
+            not data.get("optional", not data.get("required", True)),
+            data.get("max_length"),
+            data.get("min_items"),
+            data.get("max_items"),
+        )
+
+    @property
+    def constrained(self) -> bool:
+        return self.max_length is not None or self.min_items is not None or self.max_items is not None
+
+    @property
+    def output_tokens(self) -> int:
+        """Estimated tokens the model writes for this field."""
+        if self.max_length is not None:
+            return (self.max_length + 3) // 4
+        if self.kind == FIELD_LIST:
+            return (self.max_items or self.min_items or DEFAULT_LIST_ITEMS) * TOKENS_PER_LIST_ITEM
+        return DEFAULT_FIELD_TOKENS
+
+    def hint(self) -> str:
+        """Describe the constraints for a prompt, e.g. ``list, 3-7 items``."""
+        parts = []
+        if self.kind == FIELD_LIST:
+            if self.min_items is not None and self.max_items is not None:
+                parts.append(f"list, {self.min_items}-{self.max_items} items")
+            elif self.min_items is not None:
+                parts.append(f"list, at least {self.min_items} items")
+            elif self.max_items is not None:
+                parts.append(f"list, at most {self.max_items} items")
+            else:
+                parts.append("list")
+        if self.max_length is not None:
+            parts.append(f"max {self.max_length} characters")
+        if not self.required:
+            parts.append("optional")
+        return ", ".join(parts)
+
+    def check(self, content: Any, section_key: str) -> List[Dict[str, Any]]:
+        """Return the constraints ``content`` violates."""
+        violations = []
+
+        def violate(constraint: str, limit: int, actual: int):
+            violations.append({
+                "section": section_key, "field": self.key, "constraint": constraint,
+                "limit": limit, "actual": actual,
+            })
+
+        if self.max_length is not None and isinstance(content, str) and len(content) > self.max_length:
+            violate("max_length", self.max_length, len(content))
+        if self.min_items is not None or self.max_items is not None:
+            items = count_list_items(content)
+            if self.min_items is not None and items < self.min_items:
+                violate("min_items", self.min_items, items)
+            if self.max_items is not None and items > self.max_items:
+                violate("max_items", self.max_items, items)
+        return violations
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {"key": self.key, "title": self.title, "type": self.kind, "required": self.required}
+        if self.prompt:
+            data["prompt"] = self.prompt
+        for name in ("max_length", "min_items", "max_items"):
+            value = getattr(self, name)
+            if value is not None:
+                data[name] = value
+        return data
+
+
+class SectionSpec:
+    """A compiled template section: its fields and the section-level limits."""
+
+    __slots__ = ("key", "title", "required", "prompts", "fields", "limits", "output_tokens")
+
+    def __init__(self, key: str, data: Dict[str, Any]):
+        self.key = key
+        self.title = data.get("title", key)
+        self.required = bool(data.get("required", False))
+        self.prompts: Tuple[str, ...] = tuple(data.get("prompts", ()))
+        self.fields: Tuple[FieldSpec, ...] = tuple(
+            FieldSpec.from_dict(field["key"], field) for field in data.get("fields", ())
+        )
+        limits = FieldSpec.from_dict(key, data)
+        self.limits: Optional[FieldSpec] = limits if limits.constrained else None
+        if self.limits is not None:
+            self.output_tokens = self.limits.output_tokens
+        elif self.fields:
+            self.output_tokens = sum(field.output_tokens for field in self.fields)
+        else:
+            self.output_tokens = DEFAULT_SECTION_TOKENS
+
+    @property
+    def constrained(self) -> bool:
+        return self.limits is not None or any(field.constrained for field in self.fields)
+
+    def check(self, content: Any) -> List[Dict[str, Any]]:
+        """Return the constraints a section's content violates.
+
+        Field constraints are checked against the text under the field's
+        sub-heading within the section; fields without one are not checked.
+        """
+        violations = self.limits.check(content, self.key) if self.limits is not None else []
+        constrained = [field for field in self.fields if field.constrained]
+        if not constrained:
+            return violations
+
+        if isinstance(content, dict):
+            values = content
+        else:
+            values = SectionParser({field.key: {"title": field.title} for field in self.fields}).parse(content)
+
+        for field in constrained:
+            if field.key in values:
+                violations.extend(field.check(values[field.key], self.key))
+        return violations
+
+
+class CompiledTemplate:
+    """A template compiled once into ordered section specs and precomputed lookups."""
+
+    __slots__ = ("template_type", "kind", "name", "description", "sections", "required",
+                 "constrained", "output_tokens")
+
+    def __init__(self, template_type: str, kind: str, template: Dict[str, Any]):
+        self.template_type = template_type
+        self.kind = kind
+        self.name = template.get("name", "")
+        self.description = template.get("description", "")
+        self.sections: Dict[str, SectionSpec] = {
+            key: SectionSpec(key, data) for key, data in template.get("sections", {}).items()
+        }
+        self.required: Tuple[str, ...] = tuple(key for key, section in self.sections.items() if section.required)
+        self.constrained = any(section.constrained for section in self.sections.values())
+        self.output_tokens = sum(section.output_tokens for section in self.sections.values())
+
+    def check(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Return every constraint violated by the sections present in ``data``."""
+        violations = []
+        for key, content in data.items():
+            section = self.sections.get(key)
+            if section is not None and content:
+                violations.extend(section.check(content))
+        return violations
+
+
+def normalize_pmd_template(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert the nested YAML PMD template into the JSON template layout.
+
+    Each top-level entry with a ``prompt`` or ``sections`` becomes a section;
+    its sub-sections become ``fields`` carrying their ``type``,
+    ``max_length``, ``min_items`` and ``max_items`` constraints, and their
+    prompts become the section's guiding questions.
+    """
+    root = data.get("pmd_template", data)
+    header = root.get("header", {}) if isinstance(root.get("header"), dict) else {}
+    name = _PLACEHOLDER_PATTERN.sub("", str(header.get("title", ""))).strip(" -") or "Product Management Document"
+
+    sections = {}
+    for key, entry in root.items():
+        if not isinstance(entry, dict) or not ("prompt" in entry or "sections" in entry):
+            continue
+
+        children = entry.get("sections") or {}
+        if isinstance(children, list):
+            children = {child: {} for child in children}
+
+        fields = []
+        prompts = [entry["prompt"]] if entry.get("prompt") else []
+        for field_key, field_data in children.items():
+            field_data = field_data or {}
+            title = humanize(field_key)
+            prompt = field_data.get("prompt", "")
+            if field_data.get("format"):
+                prompt = f"{prompt} (format: {field_data['format']})" if prompt else f"Format: {field_data['format']}"
+            field = {key_: field_data[key_] for key_ in ("type", "max_length", "min_items", "max_items", "optional")
+                     if key_ in field_data}
+            fields.append({"key": field_key, "title": title, "prompt": prompt, **field})
+            prompts.append(f"{title}: {prompt}" if prompt else title)
+
+        sections[key] = {
+            "title": humanize(key),
+            "content": "",
+            "required": not entry.get("optional", False),
+            "prompts": prompts,
+            "fields": fields,
+        }
+
+    return {
+        "name": name,
+        "templateType": KIND_PMD,
+        "description": "Product management document with per-field length and list constraints",
+        "sections": sections,
+    }